@@ -1,29 +1,79 @@
 # api_server.py - FastAPI 服务器
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartParser, MultiPartException
+from starlette.datastructures import UploadFile
 from pydantic import BaseModel
 import os
 import sys
-import uuid
-import tempfile
-import shutil
+import asyncio
+import json
+import time
+import threading
+import requests
 from typing import List, Optional
 
 # 添加当前目录到路径
 sys.path.insert(0, os.path.dirname(__file__))
 
-from generator import generate_dialogue
-from tts_qwen3 import Qwen3TTSEngine
-from merger_advanced import merge_audio_advanced
-from script_generator import generate_podcast_script
+import config
+from config import DASHSCOPE_API_KEY
+from tts_qwen3 import Qwen3TTSEngine, TTS_IN_MEMORY
+from tts_backends import synthesizer_pool
+from tts_edge import edge_tts_engine
+from rerender import rerender_podcast
+from segmenter import segment_dialogue, SEGMENT_CONFIG
+from pipeline import (
+    generate_podcast, create_dialogue, synthesize_podcast, merge_podcast, stream_podcast,
+    stream_podcast_frames, temporary_output, publish_output, output_path, public_segments, PipelineError,
+    CONTENT_NAME_PATTERN, FORMAT_MEDIA_TYPES
+)
+from jobs import create_job_queue
+from utils.job_store import JobStore
+from utils.stage_executor import StageExecutors, StageBusy, DEFAULT_STAGE_CONFIG
+from script_generator import generate_podcast_script, estimate_duration
 from utils.document_analyzer import DocumentAnalyzer
-from utils.log_utils import info, error
+from utils.http_files import file_response, IMMUTABLE_CACHE_CONTROL
+from utils.retention import RetentionSweeper
+from utils.upload_limit import BodySizeLimitMiddleware
+from utils.log_utils import info, error, warning, logger
 
 app = FastAPI(title="AI 播客生成器 API")
 
+# 阻塞阶段的线程池：网络请求（llm、tts）与 CPU 密集的解析、合并分开，各自限制排队长度
+stages = StageExecutors({**DEFAULT_STAGE_CONFIG, **getattr(config, 'EXECUTOR_CONFIG', {})})
+
+
+@app.exception_handler(StageBusy)
+async def stage_busy_handler(request, exc: StageBusy):
+    """阶段已满：返回 429 并给出建议的重试时间"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "stage": exc.stage},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+# 文档上传：超过 max_bytes 的请求直接返回 413，不超过 spool_bytes 的文件只保存在内存中
+# （在 CORS 之前添加，使 413 响应仍带有 CORS 头）
+UPLOAD_CONFIG = getattr(config, 'UPLOAD_CONFIG', {})
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={"/api/analyze/document": UPLOAD_CONFIG.get('max_bytes', 20 * 1024 * 1024)}
+)
+# 上传文件的内存缓冲区（超过后才写入匿名临时文件），只设置在 /api/analyze/document 的解析器实例上，
+# 不影响其它路由；不同 Starlette 版本的属性名不同
+UPLOAD_SPOOL_BYTES = UPLOAD_CONFIG.get('spool_bytes', 8 * 1024 * 1024)
+UPLOAD_SPOOL_ATTR = next(
+    (attr for attr in ('spool_max_size', 'max_file_size') if hasattr(MultiPartParser, attr)), None
+)
+if UPLOAD_SPOOL_ATTR is None:
+    warning("⚠️ 当前 Starlette 版本不支持设置上传缓冲区大小，UPLOAD_CONFIG['spool_bytes'] 不生效")
+
 # 配置 CORS
 app.add_middleware(
     CORSMiddleware,
@@ -58,12 +108,31 @@ class DialogueLine(BaseModel):
     text: str
 
 
+class RerenderRequest(BaseModel):
+    previous: str  # 上一次生成的音频文件名（如 podcast_xxx.mp3）
+    dialogue: List[DialogueLine]
+
+
+class StreamRequest(BaseModel):
+    script: Optional[str] = None               # 原始脚本（先调用 LLM 生成对话）
+    dialogue: Optional[List[DialogueLine]] = None  # 已有的对话（直接合成，首段音频更快到达）
+    format: str = "mp3"                        # mp3 或 opus
+
+
 class PodcastResponse(BaseModel):
     success: bool
     dialogue: List[DialogueLine]
     audio_url: str
     duration: float
     message: str
+    segments: List[dict] = []
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    events_url: str
 
 
 class ScriptResponse(BaseModel):
@@ -78,16 +147,97 @@ class ScriptResponse(BaseModel):
 # TTS 引擎（全局实例）
 tts_engine = None
 doc_analyzer = None
+job_queue = None
+
+# 流式输出格式 -> (媒体类型, 比特率)
+STREAM_FORMATS = {
+    "mp3": ("audio/mpeg", "128k"),
+    "opus": ("audio/ogg", "48k")
+}
+
+# 正在后台执行的流式生成任务（保持引用，避免任务被回收）
+stream_tasks = set()
+
+# 磁盘清理：各目录的默认配额（RETENTION_CONFIG['directories'] 中的同名项会覆盖对应字段）
+RETENTION_CONFIG = getattr(config, 'RETENTION_CONFIG', {})
+DEFAULT_RETENTION_DIRECTORIES = {
+    "output": {"path": "output", "max_bytes": 5 * 1024 ** 3, "max_age_days": 30},
+    # TTS 缓存（audio/cache）有自己的 LRU 配额，这里只清理未启用缓存时的片段文件
+    "audio": {"path": "audio", "max_bytes": 2 * 1024 ** 3, "max_age_days": 7, "exclude": ["cache"]},
+    "logs": {"path": "logs", "max_bytes": 200 * 1024 ** 2, "max_age_days": 14}
+}
+sweeper = None
+sweeper_task = None
+
+
+def create_sweeper() -> RetentionSweeper:
+    """按 RETENTION_CONFIG 创建清理器（相对路径以项目目录为基准）"""
+    directories = {}
+    overrides = RETENTION_CONFIG.get('directories', {})
+    for name in set(DEFAULT_RETENTION_DIRECTORIES) | set(overrides):
+        options = {**DEFAULT_RETENTION_DIRECTORIES.get(name, {}), **(overrides.get(name) or {})}
+        options['path'] = os.path.join(os.path.dirname(__file__), options.get('path', name))
+        directories[name] = options
+    return RetentionSweeper(
+        directories,
+        min_age=RETENTION_CONFIG.get('min_age', 600),
+        # 正在写入的日志文件不能删除
+        protected=lambda: {logger.log_file},
+        # 多个工作进程时只由其中一个进程清理
+        lock_path=os.path.join(os.path.dirname(__file__), 'data', 'retention.lock')
+    )
+
+
+async def sweep_periodically(interval: float):
+    """后台任务：定期按配额清理 output/、audio/ 和 logs/"""
+    while True:
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, sweeper.sweep_if_due, interval)
+        except Exception as e:
+            error(f"❌ 磁盘清理失败: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+def run_generate_job(request: dict, report) -> dict:
+    """后台任务：根据脚本生成播客（在任务队列的工作线程中执行）"""
+    result = generate_podcast(request['script'], tts_engine, in_memory=TTS_IN_MEMORY, progress=report)
+    return {
+        "dialogue": result['dialogue'],
+        "audio_url": f"/api/audio/{result['audio_filename']}",
+        "duration": result['duration'],
+        "segments": result['segments']
+    }
 
 
 @app.on_event("startup")
 async def startup_event():
-    global tts_engine, doc_analyzer
+    global tts_engine, doc_analyzer, job_queue, sweeper, sweeper_task
     info("🚀 FastAPI 服务器启动")
     tts_engine = Qwen3TTSEngine()
+    # 备选 TTS 直接在服务器事件循环上运行
+    edge_tts_engine.bind_loop(asyncio.get_running_loop())
     doc_analyzer = DocumentAnalyzer()
     info("✅ TTS 引擎初始化完成")
     info("✅ 文档分析器初始化完成")
+    job_queue = create_job_queue()
+    job_queue.register("generate_audio", run_generate_job)
+    job_queue.start()
+    if RETENTION_CONFIG.get('enabled', True):
+        sweeper = create_sweeper()
+        sweeper_task = asyncio.create_task(sweep_periodically(RETENTION_CONFIG.get('interval', 600)))
+        info("✅ 磁盘清理任务已启动")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if sweeper_task:
+        sweeper_task.cancel()
+    if job_queue:
+        # 在线程池中等待正在执行的任务，避免阻塞事件循环（edge-tts 备选协程仍需运行）
+        await asyncio.get_running_loop().run_in_executor(None, job_queue.shutdown)
+    stages.shutdown()
+    synthesizer_pool.close_all()
+    info(f"🛑 TTS 会话池已关闭（新建 {synthesizer_pool.created} 个，复用 {synthesizer_pool.reused} 次）")
 
 
 @app.get("/")
@@ -122,7 +272,11 @@ async def health():
             "standard": "1.0.0",
             "soulx": "1.0.0",
             "pro": "1.0.0"
-        }
+        },
+        "worker": os.getpid(),
+        "tts": tts_engine.health() if tts_engine else None,
+        "stages": stages.stats(),
+        "retention": sweeper.stats() if sweeper else None
     }
 
 
@@ -134,7 +288,7 @@ class URLRequest(BaseModel):
 async def analyze_url(request: URLRequest):
     """分析网址内容"""
     try:
-        result = doc_analyzer.analyze_url(request.url)
+        result = await stages.run("parse", doc_analyzer.analyze_url, request.url)
         if result:
             return {
                 "success": True,
@@ -142,31 +296,60 @@ async def analyze_url(request: URLRequest):
             }
         else:
             raise HTTPException(status_code=500, detail="网址分析失败")
+    except (HTTPException, StageBusy):
+        raise
     except Exception as e:
         error(f"网址分析失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/analyze/document", response_model=dict)
-async def analyze_document(file: UploadFile = File(...)):
-    """分析上传的文档"""
+async def _parse_upload(request: Request):
+    """
+    解析文档上传请求的 multipart 表单
+
+    使用单独的解析器实例，只在本次请求上设置上传缓冲区大小。
+
+    Args:
+        request: 请求对象
+
+    Returns:
+        FormData: 表单数据（调用方负责 close）
+    """
+    if "multipart/form-data" not in request.headers.get("content-type", ""):
+        raise HTTPException(status_code=400, detail="请以 multipart/form-data 上传文件")
+    parser = MultiPartParser(request.headers, request.stream(), max_files=1, max_fields=10)
+    if UPLOAD_SPOOL_ATTR:
+        setattr(parser, UPLOAD_SPOOL_ATTR, UPLOAD_SPOOL_BYTES)
     try:
-        # 保存临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as tmp_file:
-            shutil.copyfileobj(file.file, tmp_file)
-            tmp_path = tmp_file.name
+        return await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
 
+@app.post("/api/analyze/document", response_model=dict)
+async def analyze_document(request: Request):
+    """
+    分析上传的文档（表单字段 file）
+
+    直接从上传缓冲区解析（不另存临时文件），解析在 parse 阶段的线程池中进行；
+    请求体大小由 BodySizeLimitMiddleware 限制。
+    """
+    parsers = {
+        'docx': doc_analyzer.analyze_word,
+        'pdf': doc_analyzer.analyze_pdf
+    }
+    form = await _parse_upload(request)
+    try:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=400, detail="缺少上传文件")
         # 根据文件类型分析
-        file_ext = file.filename.split('.')[-1].lower()
-        if file_ext == 'docx':
-            result = doc_analyzer.analyze_word(tmp_path)
-        elif file_ext == 'pdf':
-            result = doc_analyzer.analyze_pdf(tmp_path)
-        else:
+        file_ext = (file.filename or '').rsplit('.', 1)[-1].lower()
+        if file_ext not in parsers:
             raise HTTPException(status_code=400, detail="不支持的文件格式")
 
-        # 删除临时文件
-        os.unlink(tmp_path)
+        file.file.seek(0)
+        result = await stages.run("parse", parsers[file_ext], file.file, name=file.filename)
 
         if result:
             return {
@@ -176,11 +359,13 @@ async def analyze_document(file: UploadFile = File(...)):
         else:
             raise HTTPException(status_code=500, detail="文档分析失败")
 
-    except HTTPException:
+    except (HTTPException, StageBusy):
         raise
     except Exception as e:
         error(f"文档分析失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await form.close()
 
 
 @app.post("/api/generate/script", response_model=ScriptResponse)
@@ -192,13 +377,13 @@ async def generate_script(request: ScriptGenerationRequest):
         # 如果没有提供主题，从内容中提取
         theme = request.theme
         if not theme:
-            theme = doc_analyzer.extract_theme(request.content)
+            theme = await stages.run("llm", doc_analyzer.extract_theme, request.content)
             info(f"🎯 提取的主题: {theme}")
         else:
             theme = request.theme
 
         # 生成脚本
-        result = generate_podcast_script(theme, request.duration_minutes)
+        result = await stages.run("llm", generate_podcast_script, theme, request.duration_minutes)
 
         if result['success']:
             return {
@@ -212,7 +397,7 @@ async def generate_script(request: ScriptGenerationRequest):
         else:
             raise HTTPException(status_code=500, detail=result.get('error', '脚本生成失败'))
 
-    except HTTPException:
+    except (HTTPException, StageBusy):
         raise
     except Exception as e:
         error(f"脚本生成失败: {str(e)}")
@@ -223,86 +408,361 @@ async def generate_script(request: ScriptGenerationRequest):
 
 @app.post("/api/generate/audio", response_model=PodcastResponse)
 async def generate_audio_from_script(request: PodcastRequest):
-    """根据脚本生成音频"""
+    """根据脚本生成音频（同步等待完成；长脚本请使用 /api/jobs）"""
     if not request.script or len(request.script.strip()) == 0:
         raise HTTPException(status_code=400, detail="脚本内容不能为空")
 
     try:
         info(f"📝 收到音频生成请求，脚本长度: {len(request.script)} 字符")
 
-        # 1. 生成对话
-        dialogue = generate_dialogue(request.script)
-        if not dialogue:
-            raise HTTPException(status_code=500, detail="对话生成失败")
+        # 先确认三个阶段都有空位，避免 LLM 调用完成后才在合成阶段被拒绝
+        stages.admit("llm", "tts", "merge")
+
+        # 每个阶段在各自的线程池中执行，保持事件循环空闲以运行 edge-tts 备选协程
+        dialogue = await stages.run("llm", create_dialogue, request.script)
+        synthesized = await stages.run("tts", synthesize_podcast, dialogue, tts_engine, TTS_IN_MEMORY)
+        result = await stages.run("merge", merge_podcast, synthesized)
 
-        info(f"✅ 成功生成 {len(dialogue)} 段对话")
+        return {
+            "success": True,
+            "dialogue": dialogue,
+            "audio_url": f"/api/audio/{result['audio_filename']}",
+            "duration": result['duration'],
+            "message": "播客生成成功",
+            "segments": result['segments']
+        }
 
-        # 2. 转换为音频
-        audio_files = []
-        for i, line in enumerate(dialogue, 1):
-            info(f"   [{i}/{len(dialogue)}] 正在生成语音...")
-            audio_path = tts_engine.text_to_speech(line["text"], line["speaker"])
-            if audio_path:
-                audio_files.append(audio_path)
+    except StageBusy:
+        raise
+    except PipelineError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        error(f"❌ 生成播客失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"生成失败: {str(e)}")
+
+
+@app.post("/api/generate/stream")
+async def stream_audio(request: StreamRequest):
+    """
+    边合成边输出音频（分块传输的 MP3 或 Ogg/Opus）
+
+    每一句及之前的所有句子合成完成后，立即编码并连同静音间隔发送给客户端，
+    首段音频的等待时间约为一次 TTS 请求。
+    """
+    if request.format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的输出格式: {request.format}")
+    if not request.dialogue and not (request.script and request.script.strip()):
+        raise HTTPException(status_code=400, detail="脚本内容不能为空")
+    media_type, bitrate = STREAM_FORMATS[request.format]
+
+    # 响应头发出之后就无法再返回 429，先确认各阶段都有空位
+    if request.dialogue:
+        stages.admit("tts")
+        dialogue = [line.dict() for line in request.dialogue]
+    else:
+        stages.admit("llm", "tts")
+        try:
+            dialogue = await stages.run("llm", create_dialogue, request.script)
+        except PipelineError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    info(f"🌊 收到流式生成请求: {len(dialogue)} 段对话，格式 {request.format}")
+
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def sink(chunk: bytes):
+        loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+    async def produce():
+        try:
+            await stages.run(
+                "tts", stream_podcast, dialogue, tts_engine, sink,
+                output_format=request.format, bitrate=bitrate, in_memory=TTS_IN_MEMORY, cancelled=cancelled
+            )
+        except Exception as e:
+            # 响应已经开始发送，只能提前结束音频流
+            error(f"❌ 流式生成失败: {str(e)}")
+        finally:
+            chunks.put_nowait(None)
+
+    task = asyncio.create_task(produce())
+    stream_tasks.add(task)
+    task.add_done_callback(stream_tasks.discard)
+
+    async def body():
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            # 客户端断开时通知生成线程停止
+            cancelled.set()
+
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.websocket("/ws/generate")
+async def live_generate(websocket: WebSocket):
+    """
+    实时生成：客户端发送 {"script": "..."} 或 {"dialogue": [...]}，服务器依次推送
+
+    - {"type": "dialogue", "dialogue": [...], "segments": [...]}：对话解析完成（segments 为合成单位）
+    - {"type": "audio", "index", "start_ms", "end_ms", ...} 后紧跟一条二进制消息：
+      该句（含之前的静音）的 MP3 帧，按顺序拼接即可播放
+    - {"type": "line_failed", "index", "error"}：该句合成失败，已跳过
+    - {"type": "done", "duration_ms", "sample_rate", "segments"}：完整的偏移表
+    - {"type": "error", "detail", "retry_after"?}：生成失败，随后关闭连接
+    """
+    await websocket.accept()
+    cancelled = threading.Event()
+    try:
+        try:
+            request = await websocket.receive_json()
+        except ValueError:
+            request = None
+        if not isinstance(request, dict) or not isinstance(request.get("script") or "", str):
+            await websocket.send_json({"type": "error", "detail": "请求格式错误，应为 JSON 对象"})
+            await websocket.close()
+            return
+
+        script = (request.get("script") or "").strip()
+        dialogue = request.get("dialogue")
+        if not script and not dialogue:
+            await websocket.send_json({"type": "error", "detail": "脚本内容不能为空"})
+            await websocket.close()
+            return
+
+        try:
+            if dialogue:
+                stages.admit("tts")
+                dialogue = [{"speaker": line["speaker"], "text": line["text"]} for line in dialogue]
+                if not all(isinstance(line["speaker"], str) and isinstance(line["text"], str)
+                           and line["speaker"].strip() and line["text"].strip() for line in dialogue):
+                    raise TypeError("speaker 和 text 必须是非空字符串")
             else:
-                error(f"   ❌ 语音生成失败: {line['text']}")
+                stages.admit("llm", "tts")
+                dialogue = await stages.run("llm", create_dialogue, script)
+        except StageBusy as e:
+            await websocket.send_json({"type": "error", "detail": str(e), "retry_after": e.retry_after})
+            await websocket.close(code=1013)
+            return
+        except (KeyError, TypeError):
+            await websocket.send_json({"type": "error", "detail": "对话格式错误"})
+            await websocket.close()
+            return
+
+        segments = segment_dialogue(dialogue) if SEGMENT_CONFIG.get('enabled', True) else dialogue
+        info(f"🔴 实时生成: {len(dialogue)} 段对话，{len(segments)} 个合成分段")
+        await websocket.send_json({
+            "type": "dialogue",
+            "dialogue": dialogue,
+            "segments": [
+                {"index": i, "speaker": seg["speaker"], "text": seg["text"],
+                 "source_lines": seg.get("source_lines")}
+                for i, seg in enumerate(segments)
+            ]
+        })
+
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def emit(entry: dict, data: bytes):
+            loop.call_soon_threadsafe(events.put_nowait, (entry, data))
+
+        producer = asyncio.ensure_future(stages.run(
+            "tts", stream_podcast_frames, segments, tts_engine, emit,
+            in_memory=TTS_IN_MEMORY, cancelled=cancelled
+        ))
+        # 生成结束后放入结束标记，此前 emit 的消息都已在队列中
+        producer.add_done_callback(lambda _: events.put_nowait(None))
+
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            entry, data = item
+            if data is None:
+                await websocket.send_json({"type": "line_failed", **entry})
+                continue
+            await websocket.send_json({"type": "audio", "format": "mp3", "bytes": len(data), **entry})
+            await websocket.send_bytes(data)
+
+        try:
+            summary = producer.result()
+        except StageBusy as e:
+            await websocket.send_json({"type": "error", "detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            error(f"❌ 实时生成失败: {str(e)}")
+            await websocket.send_json({"type": "error", "detail": str(e)})
+        else:
+            await websocket.send_json({"type": "done", **summary})
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        warning("   ⚠️ 实时生成连接已断开")
+    finally:
+        # 客户端断开时通知生成线程停止
+        cancelled.set()
+
+
+@app.post("/api/jobs", response_model=JobResponse)
+async def submit_generate_job(request: PodcastRequest):
+    """提交播客生成任务，立即返回任务 ID（由后台工作线程执行）"""
+    if not request.script or len(request.script.strip()) == 0:
+        raise HTTPException(status_code=400, detail="脚本内容不能为空")
+
+    info(f"📝 收到音频生成任务，脚本长度: {len(request.script)} 字符")
+    # 任务存储的读写可能等待其他进程的数据库锁，放到线程池中执行，不阻塞事件循环
+    job_id = await run_in_threadpool(job_queue.submit, "generate_audio", {"script": request.script})
+    return {
+        "job_id": job_id,
+        "status": JobStore.QUEUED,
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events"
+    }
 
-        if not audio_files:
-            raise HTTPException(status_code=500, detail="音频生成失败")
 
-        # 3. 合并音频
-        output_dir = os.path.join(os.path.dirname(__file__), "output")
-        os.makedirs(output_dir, exist_ok=True)
-
-        output_filename = f"podcast_{uuid.uuid4().hex[:8]}.mp3"
-        output_file = os.path.join(output_dir, output_filename)
-
-        info(f"🎵 正在合并音频...")
-        merge_audio_advanced(
-            audio_files,
-            output_file,
-            silence_duration=100,
-            volume_adjustment=1.0,
-            output_format="mp3",
-            bitrate="128k"
+def _job_view(job: dict) -> dict:
+    """任务状态响应（不返回请求中的完整脚本）"""
+    return {
+        "job_id": job['id'],
+        "kind": job['kind'],
+        "status": job['status'],
+        "progress": job['progress'],
+        "result": job['result'],
+        "error": job['error'],
+        "created_at": job['created_at'],
+        "updated_at": job['updated_at']
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询任务状态与各阶段进度"""
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return _job_view(job)
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """以 Server-Sent Events 推送任务进度，任务结束后关闭连接"""
+    if await run_in_threadpool(job_queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    async def stream():
+        last_update = None
+        while True:
+            job = await run_in_threadpool(job_queue.get, job_id)
+            if job is None:
+                # 服务器正在停止（任务存储已关闭），结束事件流
+                return
+            if job['updated_at'] != last_update:
+                last_update = job['updated_at']
+                yield f"event: progress\ndata: {json.dumps(_job_view(job), ensure_ascii=False)}\n\n"
+            if job['status'] in JobStore.FINISHED:
+                yield f"event: {job['status']}\ndata: {{}}\n\n"
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/rerender", response_model=PodcastResponse)
+async def rerender_audio(request: RerenderRequest):
+    """根据修改后的对话重新生成音频（只重新合成新增或修改过的台词）"""
+    if not request.dialogue:
+        raise HTTPException(status_code=400, detail="对话内容不能为空")
+
+    previous_file = output_path(request.previous)
+    dialogue = [line.dict() for line in request.dialogue]
+
+    def rerender():
+        result = rerender_podcast(
+            dialogue, previous_file, temporary_output("mp3"), tts_engine,
+            in_memory=TTS_IN_MEMORY, output_format="mp3", bitrate="128k"
         )
+        if result:
+            result['audio_filename'] = publish_output(result)
+        return result
 
-        # 4. 计算时长
-        duration = len(dialogue) * 3.0
+    try:
+        info(f"🔁 收到重新生成请求: {os.path.basename(previous_file)}，{len(dialogue)} 段对话")
 
-        info(f"✅ 播客生成完成: {output_filename}")
+        # 合成与合并都在 tts 阶段的线程池中执行（合并通常只是拼接已有片段），保持事件循环空闲
+        stages.admit("tts")
+        result = await stages.run("tts", rerender)
+        if not result:
+            raise HTTPException(status_code=500, detail="音频生成失败")
+
+        output_filename = result['audio_filename']
+        info(f"✅ 播客重新生成完成: {output_filename}")
 
         return {
             "success": True,
             "dialogue": dialogue,
             "audio_url": f"/api/audio/{output_filename}",
-            "duration": duration,
-            "message": "播客生成成功"
+            "duration": result['duration_ms'] / 1000,
+            "message": f"播客重新生成成功（复用 {result['reused']} 段，重新合成 {result['synthesized']} 段）",
+            "segments": public_segments(result['segments'])
         }
 
-    except HTTPException:
+    except (HTTPException, StageBusy):
         raise
     except Exception as e:
-        error(f"❌ 生成播客失败: {str(e)}")
+        error(f"❌ 重新生成播客失败: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"生成失败: {str(e)}")
 
 
-@app.get("/api/audio/{filename}")
-async def get_audio(filename: str):
-    """获取生成的音频文件"""
-    output_dir = os.path.join(os.path.dirname(__file__), "output")
-    file_path = os.path.join(output_dir, filename)
+@app.api_route("/api/audio/{filename}", methods=["GET", "HEAD"])
+async def get_audio(filename: str, request: Request):
+    """
+    获取生成的音频文件
+
+    按内容命名的文件使用强 ETag（内容哈希）并允许永久缓存；
+    支持 Range 请求（206）和条件请求（304），拖动进度条时只下载需要的部分。
+    """
+    filename = os.path.basename(filename)
+    media_type = FORMAT_MEDIA_TYPES.get(os.path.splitext(filename)[1].lstrip('.').lower())
+    file_path = output_path(filename)
 
-    if not os.path.exists(file_path):
+    # 只提供音频文件（偏移表等同名文件不对外提供）
+    if media_type is None or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="音频文件不存在")
 
-    return FileResponse(
-        file_path,
-        media_type="audio/mpeg",
-        filename=filename
-    )
+    # 记录访问时间（保留修改时间），清理器按最近访问时间淘汰
+    try:
+        os.utime(file_path, (time.time(), os.stat(file_path).st_mtime))
+    except OSError:
+        pass
+
+    match = CONTENT_NAME_PATTERN.match(filename)
+    if match:
+        etag = f'"{match.group(1)}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        # 旧的随机文件名：内容可能被覆盖，只提供弱 ETag，每次使用前需重新验证
+        stat = os.stat(file_path)
+        etag = f'W/"{stat.st_size:x}-{int(stat.st_mtime * 1000):x}"'
+        cache_control = "no-cache"
+
+    return file_response(request, file_path, media_type, etag, cache_control, filename=filename)
 
 
 class LLMScriptRequest(BaseModel):
@@ -327,7 +787,7 @@ async def llm_generate_script(request: LLMScriptRequest):
         info(f"📝 收到 LLM 脚本生成请求")
         
         # 构造 LLM API 提示
-        theme = request.theme or doc_analyzer.extract_theme(request.content)
+        theme = request.theme or await stages.run("llm", doc_analyzer.extract_theme, request.content)
         
         system_prompt = """你是一位专业的播客主持人和嘉宾。请根据提供的主题和内容，生成一段自然、流畅的对话式播客脚本。
 
@@ -389,7 +849,8 @@ async def llm_generate_script(request: LLMScriptRequest):
         
         info(f"🤖 调用 LLM API 生成脚本...")
         
-        response = requests.post(
+        response = await stages.run(
+            "llm", requests.post,
             "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation",
             headers=headers,
             json=payload,
@@ -419,6 +880,8 @@ async def llm_generate_script(request: LLMScriptRequest):
         else:
             raise HTTPException(status_code=500, detail="LLM API 返回格式错误")
 
+    except (HTTPException, StageBusy):
+        raise
     except requests.exceptions.RequestException as e:
         error(f"❌ LLM API 调用失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"LLM API 调用失败: {str(e)}")
@@ -462,13 +925,14 @@ async def generate_script_v2(request: ScriptGenerationRequest):
                 llm_response = await llm_generate_script(llm_request)
                 
                 if llm_response["success"]:
+                    dialogue = parse_dialogue(llm_response["script"])
                     return {
                         "success": True,
                         "script": llm_response["script"],
-                        "dialogue": parse_dialogue(llm_response["script"]),
+                        "dialogue": dialogue,
                         "theme": llm_response["theme"],
                         "duration_minutes": request.duration_minutes,
-                        "estimated_duration": llm_response["duration_minutes"] * 60,
+                        "estimated_duration": estimate_duration(dialogue),
                         "model": llm_response["model"],
                         "mode": "llm_api"
                     }
@@ -482,13 +946,13 @@ async def generate_script_v2(request: ScriptGenerationRequest):
             info("📝 使用内部模板生成脚本...")
             
             if not request.theme:
-                theme = doc_analyzer.extract_theme(request.content)
+                theme = await stages.run("llm", doc_analyzer.extract_theme, request.content)
                 info(f"🎯 提取的主题: {theme}")
             else:
                 theme = request.theme
             
             # 生成脚本
-            result = generate_podcast_script(theme, request.duration_minutes)
+            result = await stages.run("llm", generate_podcast_script, theme, request.duration_minutes)
             
             if result['success']:
                 return {
@@ -503,7 +967,7 @@ async def generate_script_v2(request: ScriptGenerationRequest):
             else:
                 raise HTTPException(status_code=500, detail=result.get('error', '脚本生成失败'))
 
-    except HTTPException:
+    except (HTTPException, StageBusy):
         raise
     except Exception as e:
         error(f"❌ 脚本生成失败: {str(e)}")
@@ -552,4 +1016,13 @@ def parse_dialogue(script: str) -> list:
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    SERVER_CONFIG = getattr(config, 'SERVER_CONFIG', {})
+    workers = SERVER_CONFIG.get('workers', 1)
+    # 多进程模式下 uvicorn 需要以导入字符串的形式加载应用，每个工作进程各自执行 startup；
+    # 任务状态、TTS 缓存和输出文件都保存在共享的本地目录中，任一进程都能查询任务和提供音频
+    uvicorn.run(
+        "api_server:app" if workers > 1 else app,
+        host=SERVER_CONFIG.get('host', "0.0.0.0"),
+        port=SERVER_CONFIG.get('port', 8001),
+        workers=workers
+    )
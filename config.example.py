@@ -31,8 +31,140 @@ DASHSCOPE_MODEL = "qwen-turbo"
 # Qwen3 TTS模型配置
 QWEN3_TTS_MODEL = "qwen3-tts-instruct-flash-realtime"
 QWEN3_TTS_CONFIG = {
-    "format": "wav",
+    "format": "wav",         # wav / pcm 为无损格式，合并时无需逐段解码 MP3；也可设为 mp3
     "sample_rate": 24000,
+    "bitrate": 128,          # format 为 mp3 时的码率（kbps），与输出码率（128k）一致时合并可直接拼接帧
     "volume": 50,
     "speed": 1.0
 }
+
+# TTS 后端（可选: qwen3, edge, synthetic）
+# synthetic 为离线模拟后端，不访问网络，用于压测和基准测试
+TTS_BACKEND = "qwen3"
+TTS_FALLBACK_BACKEND = "edge"  # 设为 None 或 "" 表示不使用备选后端
+
+# 离线模拟后端参数
+SYNTHETIC_TTS_CONFIG = {
+    "chars_per_second": 4.5,  # 语速（每秒字数），决定生成音频的时长
+    "sample_rate": 24000,
+    "latency": 0.3,           # 每次请求的模拟延迟（秒）
+    "jitter": 0.1,            # 延迟抖动（秒）
+    "seed": 0
+}
+
+# TTS 后端熔断器：连续失败 failure_threshold 次后，reset_timeout 秒内直接使用备选后端
+TTS_CIRCUIT_BREAKER = {
+    "failure_threshold": 3,
+    "reset_timeout": 30.0
+}
+
+# 对冲请求：主后端超过延迟分位数仍未返回时，同时请求备选后端并取先完成的结果
+TTS_HEDGING = {
+    "enabled": False,
+    "percentile": 95,       # 使用主后端延迟的 p95 作为等待时间
+    "min_delay": 1.0,       # 等待时间下限（秒）
+    "initial_delay": 3.0,   # 样本不足时的等待时间（秒）
+    "min_samples": 5
+}
+
+# 对话分段：合并同一说话人相邻的短句，并在标点处拆分过长的句子以便并行合成
+SEGMENT_CONFIG = {
+    "enabled": True,
+    "target_chars": 60,   # 合并短句的目标字数
+    "max_chars": 120,     # 单次合成的最大字数，超过则拆分
+    "split_gap": 0        # 同一句拆分出的块之间的静音（毫秒）
+}
+
+# 对话合成并发数（同时进行的 TTS 请求数）
+TTS_CONCURRENCY = 4
+
+# TTS 结果以内存片段直接交给合并器（不写入单独的片段文件）
+TTS_IN_MEMORY = True
+
+# SpeechSynthesizer 会话池（复用 WebSocket 连接）
+QWEN3_TTS_POOL = {
+    "max_idle_per_key": 4,   # 每个 (模型, 音色) 最多保留的空闲会话数
+    "idle_timeout": 60.0,    # 空闲会话保留时间（秒）
+    "max_uses": 200          # 单个会话最大复用次数
+}
+
+# TTS 语音片段缓存（按文本、说话人、音色、模型和参数去重）
+TTS_CACHE = {
+    "enabled": True,
+    "max_bytes": 512 * 1024 * 1024,  # 缓存总大小上限（字节），超出后按 LRU 淘汰
+    "sync_interval": 60              # 多个工作进程共享缓存时，重新扫描目录统计总大小的最长间隔（秒）
+}
+
+# edge-tts 备选方案（异步引擎）
+EDGE_TTS_CONFIG = {
+    "concurrency": 8,  # 同时进行的合成数
+    "timeout": 30.0    # 单段语音超时（秒）
+}
+
+# 音频合并
+MERGE_CONFIG = {
+    "streaming": False,     # 流式合并：逐段送入常驻编码进程，内存占用与播客时长无关（适合长播客）
+    "decode_workers": None, # 并行解码线程数，None 表示使用 CPU 核数
+    "stream_copy": True,    # 无需音量调整和背景音乐且片段 MP3 参数一致时，直接拼接帧（不重新编码）
+                            # 需要片段本身是与输出码率相同的 MP3：QWEN3_TTS_CONFIG 设为 format "mp3"、bitrate 128；
+                            # 默认的 wav 格式、edge（48k MP3）和 synthetic 后端总是解码重编码
+    "manifest": True        # 在输出文件旁写入同名 .json 偏移表（每段的起止时间、说话人、文本指纹）
+}
+
+# 背景音乐
+BGM_CONFIG = {
+    "ducking": True,     # 人声期间自动压低背景音乐
+    "duck_gain": 0.35,   # 人声期间背景音乐的增益（相对于 bgm_volume）
+    "attack_ms": 80,     # 人声开始前压低的时长
+    "release_ms": 250,   # 人声结束后恢复的时长
+    "cache_entries": 4   # 进程内缓存的已解码背景音乐数量
+}
+
+# 后台任务队列（POST /api/jobs 提交，GET /api/jobs/{id} 或 /events 查询进度）
+JOB_CONFIG = {
+    "workers": 2,               # 每个进程同时执行的生成任务数
+    "db_path": None,            # 任务状态数据库路径，None 表示 data/jobs.db（所有工作进程共享）
+    "resume_on_startup": True,  # 进程退出或服务器重启后重新执行中断的任务（否则标记为失败）
+    "max_pending": 50,          # 排队和执行中的任务数上限（所有进程合计），超出时返回 429（0 表示不限制）
+    "retry_after": 30,          # 返回 429 时建议的重试时间（秒）
+    "poll_interval": 1.0,       # 空闲时检查其他进程提交的任务的间隔（秒）
+    "lease_timeout": 60,        # 执行中任务的心跳超时（秒），超时后视为所在进程已退出
+    "max_attempts": 3           # 每个任务最多执行次数，反复导致进程退出的任务达到后标记为失败（0 表示不限制）
+}
+
+# 阻塞阶段的线程池与准入控制（正在执行和等待的请求数达到 workers + max_queue 时返回 429）
+# llm、tts 为网络请求，parse（文档解析）、merge（音频合并）为 CPU 密集型；未列出的阶段使用默认值
+EXECUTOR_CONFIG = {
+    "llm": {"workers": 8, "max_queue": 32, "retry_after": 10},
+    "tts": {"workers": 4, "max_queue": 8, "retry_after": 30},   # 每个请求内部仍按 TTS_CONCURRENCY 并发
+    "parse": {"workers": 2, "max_queue": 8, "retry_after": 5},
+    "merge": {"workers": 2, "max_queue": 8, "retry_after": 10}
+}
+
+# 磁盘清理：定期按配额删除 output/、audio/、logs/ 中最久未访问的文件
+# 正在生成或重渲染中使用的文件、以及 min_age 秒内访问过的文件不会被删除
+RETENTION_CONFIG = {
+    "enabled": True,
+    "interval": 600,   # 清理间隔（秒）
+    "min_age": 600,    # 宽限期（秒）
+    "directories": {
+        "output": {"max_bytes": 5 * 1024 ** 3, "max_age_days": 30},
+        "audio": {"max_bytes": 2 * 1024 ** 3, "max_age_days": 7},   # 不含 audio/cache（见 TTS_CACHE）
+        "logs": {"max_bytes": 200 * 1024 ** 2, "max_age_days": 14}
+    }
+}
+
+# 文档上传（/api/analyze/document）
+UPLOAD_CONFIG = {
+    "max_bytes": 20 * 1024 * 1024,   # 请求体上限，超过时返回 413
+    "spool_bytes": 8 * 1024 * 1024   # 不超过该大小的上传只保存在内存中
+}
+
+# 服务器（python api_server.py）
+# workers > 1 时启动多个 uvicorn 工作进程，任务状态（data/jobs.db）、TTS 缓存和输出文件
+# 保存在共享的本地目录中，任一进程都能查询任务进度和提供音频；磁盘清理同一时刻只由一个进程执行
+SERVER_CONFIG = {
+    "host": "0.0.0.0",
+    "port": 8001,
+    "workers": 1
+}
@@ -0,0 +1,223 @@
+# jobs.py - 后台任务队列：提交后立即返回任务 ID，由工作线程执行耗时的生成流程
+
+import os
+import socket
+import threading
+import config
+from utils.job_store import JobStore
+from utils.stage_executor import StageBusy
+from utils.log_utils import info, error, warning
+
+# 任务队列配置
+JOB_CONFIG = getattr(config, 'JOB_CONFIG', {})
+
+# 任务状态数据库的默认位置
+DEFAULT_JOB_DB = os.path.join(os.path.dirname(__file__), 'data', 'jobs.db')
+
+
+class JobLost(Exception):
+    """任务的租约已过期并被其他进程收回，本进程应停止执行并丢弃结果"""
+
+
+class JobQueue:
+    """
+    后台任务队列
+
+    任务的请求参数、状态和进度保存在 JobStore 中；工作线程从存储中按提交顺序领取任务，
+    并在各阶段通过 report 回调更新进度。多个 uvicorn 工作进程共享同一个数据库时，
+    任一进程提交的任务可由任一进程执行和查询。执行中的任务定期续租，
+    进程退出后租约过期的任务由其他进程（或重启后的服务器）重新排队，执行次数达到 max_attempts 后标记为失败。
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, max_pending: int = 0, retry_after: float = 30.0,
+                 poll_interval: float = 1.0, lease_timeout: float = 60.0, max_attempts: int = 3):
+        """
+        初始化任务队列
+
+        Args:
+            store: 任务状态存储
+            workers: 本进程同时执行的任务数
+            max_pending: 排队和执行中的任务数上限（所有进程合计），达到后拒绝新任务（0 表示不限制）
+            retry_after: 拒绝新任务时建议的重试时间（秒）
+            poll_interval: 空闲时检查其他进程提交的新任务的间隔（秒）
+            lease_timeout: 执行中任务的心跳超时时间（秒），超时视为所在进程已退出
+            max_attempts: 每个任务最多执行的次数（含中断后的重试，0 表示不限制）
+        """
+        self.store = store
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers = {}
+        self._threads = []
+        self._maintainer = None
+        self._stopping = threading.Event()
+        self._maintainer_stopping = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, handler):
+        """
+        注册任务处理函数
+
+        Args:
+            kind: 任务类型
+            handler: handler(request: dict, report) -> dict，report(阶段, **详情) 用于报告进度，
+                返回值作为任务结果保存，抛出异常表示任务失败
+        """
+        self._handlers[kind] = handler
+
+    def start(self):
+        """启动工作线程和续租线程，并收回已退出进程遗留的任务"""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._maintainer_stopping.clear()
+            self._maintainer = threading.Thread(target=self._maintain, name="job-lease", daemon=True)
+            self._threads = [
+                threading.Thread(target=self._work, name=f"job-{i}", daemon=True) for i in range(self.workers)
+            ]
+        self._maintainer.start()
+        for thread in self._threads:
+            thread.start()
+        info(f"✅ 任务队列已启动（进程: {self.owner}，工作线程: {self.workers}）")
+
+    def submit(self, kind: str, request: dict) -> str:
+        """
+        提交任务
+
+        Args:
+            kind: 任务类型（需已注册）
+            request: 请求参数（需可 JSON 序列化）
+
+        Returns:
+            str: 任务 ID
+
+        Raises:
+            StageBusy: 排队和执行中的任务已达到 max_pending
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"未知的任务类型: {kind}")
+        if self.max_pending and self.store.count_unfinished() >= self.max_pending:
+            warning(f"   🚦 任务队列已满（{self.max_pending}），拒绝新任务")
+            raise StageBusy("jobs", int(self.retry_after))
+        job_id = self.store.create(kind, request)
+        self._wakeup.set()
+        info(f"📋 任务已提交: {job_id} ({kind})")
+        return job_id
+
+    def _work(self):
+        """工作线程：领取并执行任务，没有任务时等待唤醒或定期检查"""
+        while not self._stopping.is_set():
+            try:
+                job = self.store.claim(self.owner)
+            except Exception as e:
+                warning(f"   ⚠️ 领取任务失败: {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _maintain(self):
+        """续租线程：刷新本进程执行中任务的心跳，并收回租约过期的任务"""
+        interval = max(1.0, self.lease_timeout / 4)
+        requeue = JOB_CONFIG.get('resume_on_startup', True)
+        while True:
+            try:
+                self.store.heartbeat(self.owner)
+                requeued, failed = self.store.reclaim_stale(
+                    self.lease_timeout, requeue=requeue, max_attempts=self.max_attempts
+                )
+                if requeued:
+                    info(f"📋 重新排队 {requeued} 个中断的任务")
+                    self._wakeup.set()
+                if failed:
+                    warning(f"   ⚠️ {failed} 个任务因所在进程退出而中断，已标记为失败")
+            except Exception as e:
+                warning(f"   ⚠️ 任务续租失败: {str(e)}")
+            if self._maintainer_stopping.wait(interval):
+                return
+
+    def get(self, job_id: str) -> dict:
+        """查询任务（不存在时返回 None）"""
+        return self.store.get(job_id)
+
+    def _run(self, job: dict):
+        """在工作线程中执行已领取的任务并记录结果"""
+        job_id = job['id']
+        handler = self._handlers.get(job['kind'])
+        if handler is None:
+            self.store.update(job_id, status=JobStore.FAILED, error=f"未知的任务类型: {job['kind']}",
+                              owner=self.owner)
+            return
+
+        progress = {'stage': 'starting'}
+        self.store.update(job_id, progress=progress, owner=self.owner)
+
+        def report(stage: str, **details):
+            progress['stage'] = stage
+            progress.update(details)
+            try:
+                updated = self.store.update(job_id, progress=dict(progress), owner=self.owner)
+            except Exception as e:
+                # 进度写入失败不影响任务本身
+                warning(f"   ⚠️ 任务进度更新失败: {job_id} - {str(e)}")
+                return
+            if not updated:
+                raise JobLost(job_id)
+
+        try:
+            info(f"▶️ 开始执行任务: {job_id} ({job['kind']})")
+            result = handler(job['request'], report)
+        except JobLost:
+            warning(f"   ⚠️ 任务已被其他进程收回，停止执行: {job_id}")
+            return
+        except Exception as e:
+            error(f"❌ 任务失败: {job_id} - {str(e)}")
+            progress['stage'] = JobStore.FAILED
+            if not self.store.update(job_id, status=JobStore.FAILED, progress=progress, error=str(e),
+                                     owner=self.owner):
+                warning(f"   ⚠️ 任务已被其他进程收回，丢弃本次结果: {job_id}")
+            return
+
+        progress['stage'] = JobStore.SUCCEEDED
+        if not self.store.update(job_id, status=JobStore.SUCCEEDED, progress=progress, result=result,
+                                 owner=self.owner):
+            warning(f"   ⚠️ 任务已被其他进程收回，丢弃本次结果: {job_id}")
+            return
+        info(f"✅ 任务完成: {job_id}")
+
+    def shutdown(self):
+        """停止领取新任务并等待正在执行的任务结束（排队中的任务留给其他进程或下次启动时执行）"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            maintainer, self._maintainer = self._maintainer, None
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in threads:
+            thread.join()
+        # 正在执行的任务结束前继续续租，避免被其他进程收回
+        self._maintainer_stopping.set()
+        if maintainer is not None:
+            maintainer.join()
+        self.store.close()
+
+
+def create_job_queue() -> JobQueue:
+    """按 JOB_CONFIG 创建任务队列"""
+    store = JobStore(JOB_CONFIG.get('db_path') or DEFAULT_JOB_DB)
+    return JobQueue(
+        store,
+        workers=JOB_CONFIG.get('workers', 2),
+        max_pending=JOB_CONFIG.get('max_pending', 0),
+        retry_after=JOB_CONFIG.get('retry_after', 30),
+        poll_interval=JOB_CONFIG.get('poll_interval', 1.0),
+        lease_timeout=JOB_CONFIG.get('lease_timeout', 60),
+        max_attempts=JOB_CONFIG.get('max_attempts', 3)
+    )
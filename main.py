@@ -9,9 +9,10 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from generator import generate_dialogue, display_dialogue
-from tts_qwen3 import Qwen3TTSEngine as TTSEngine
+from tts_qwen3 import Qwen3TTSEngine as TTSEngine, TTS_IN_MEMORY
 from merger_simple import merge_audio
 from merger_advanced import merge_audio_advanced
+from segmenter import segment_dialogue, SEGMENT_CONFIG
 from utils.file_utils import read_file, get_output_path
 from utils.log_utils import info, warning, error, critical
 
@@ -57,20 +58,23 @@ def main(script_file: str, output_file: str = None):
         # 显示生成的对话
         display_dialogue(dialogue)
 
-        # 3. 转换为音频
+        # 3. 转换为音频（先分段：合并短句、拆分长句）
         info("🎙️ 正在转换语音...")
+        segments = segment_dialogue(dialogue) if SEGMENT_CONFIG.get('enabled', True) else dialogue
         tts = TTSEngine()
         audio_files = []
+        silence_durations = []
+        merged_segments = []
 
-        for i, line in enumerate(dialogue, 1):
-            info(f"   [{i}/{len(dialogue)}] 正在处理...")
-            audio_path = tts.text_to_speech(line['text'], line['speaker'])
-
+        for i, (segment, audio_path) in enumerate(
+                zip(segments, tts.synthesize_dialogue(segments, in_memory=TTS_IN_MEMORY)), 1):
             if audio_path:
                 audio_files.append(audio_path)
-                info(f"   ✓ 语音生成成功")
+                silence_durations.append(segment.get('gap_before'))
+                merged_segments.append(segment)
+                info(f"   ✓ 第 {i} 段语音生成成功")
             else:
-                warning(f"   ⚠️ 跳过该段语音生成")
+                warning(f"   ⚠️ 跳过第 {i} 段语音生成")
 
         if not audio_files:
             error("\n❌ 没有成功生成任何音频文件")
@@ -81,7 +85,7 @@ def main(script_file: str, output_file: str = None):
         
         # 使用高级合并功能
         # 可根据需要调整参数
-        merge_audio_advanced(
+        result = merge_audio_advanced(
             audio_files,
             output_file,
             silence_duration=100,  # 静音间隔
@@ -89,8 +93,13 @@ def main(script_file: str, output_file: str = None):
             background_music=None,  # 背景音乐路径
             bgm_volume=0.3,  # 背景音乐音量
             output_format='mp3',  # 输出格式
-            bitrate='128k'  # 比特率
+            bitrate='128k',  # 比特率
+            silence_durations=silence_durations,  # 拆分长句的块之间使用更短的间隔
+            segments=merged_segments  # 用于生成逐段偏移表
         )
+        if not result:
+            error("\n❌ 音频合并失败")
+            return False
 
         # 5. 完成
         info("\n" + "="*60)
@@ -100,6 +109,7 @@ def main(script_file: str, output_file: str = None):
         info(f"   - 原始脚本: {len(script)} 字符")
         info(f"   - 生成对话: {len(dialogue)} 条")
         info(f"   - 音频片段: {len(audio_files)} 个")
+        info(f"   - 音频时长: {result['duration_ms']/1000:.1f} 秒")
         info("="*60)
 
         return True
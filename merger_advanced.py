@@ -1,9 +1,196 @@
 # merger_advanced.py - 高级音频合并模块
 
 import os
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from pydub import AudioSegment
+import config
 from utils.log_utils import info, error, warning
 from utils.file_utils import ensure_directory
+from utils.audio_buffer import AudioBuffer
+from utils.pcm_mixer import (
+    gain_to_factor, common_format, segment_to_array, array_to_segment,
+    render_timeline, mix_loop, ms_to_frames, ducking_envelope, gap_envelope, LoopCache
+)
+from utils.stream_encoder import StreamEncoder
+from utils.mp3_frames import read_frames, silence_frame, gapless_trim
+
+# 合并器配置
+MERGE_CONFIG = getattr(config, 'MERGE_CONFIG', {})
+
+# 背景音乐配置（闪避与解码缓存）
+BGM_CONFIG = getattr(config, 'BGM_CONFIG', {})
+
+# 已解码背景音乐的 LRU 缓存（按路径和修改时间失效）
+bgm_cache = LoopCache(BGM_CONFIG.get('cache_entries', 4))
+
+# TTS 片段目录（含 cache/ 子目录），偏移表中的片段路径相对于该目录记录
+SEGMENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'audio'))
+
+
+def _describe(item) -> str:
+    """返回音频条目的名称（用于日志）"""
+    if isinstance(item, AudioBuffer):
+        return item.name
+    if isinstance(item, AudioSegment):
+        return "<内存音频>"
+    return os.path.basename(item)
+
+
+def _read_mp3_bytes(item):
+    """返回 MP3 条目的原始字节；不是 MP3 文件或 MP3 内存片段时返回 None"""
+    if isinstance(item, AudioBuffer):
+        return item.data if item.format == 'mp3' else None
+    if isinstance(item, str) and os.path.splitext(item)[1].lower() == '.mp3':
+        with open(item, 'rb') as f:
+            return f.read()
+    return None
+
+
+def _bitrate_kbps(bitrate: str) -> int:
+    """将 '128k' 形式的比特率换算为 kbps"""
+    value = str(bitrate).strip().lower()
+    if value.endswith('k'):
+        return int(float(value[:-1]))
+    return int(value) // 1000
+
+
+def _resolve_renditions(output_file: str, profiles: list) -> list:
+    """
+    根据输出配置生成每个版本的输出路径
+
+    未指定 output_file 的配置使用主输出文件名加对应扩展名；
+    同一格式出现多次时在文件名后附加比特率以区分。
+
+    Args:
+        output_file: 主输出文件路径
+        profiles: 输出配置列表，格式: [{'output_format': 'mp3', 'bitrate': '128k'}, ...]
+
+    Returns:
+        list: [(输出路径, 格式, 比特率), ...]
+    """
+    stem = os.path.splitext(output_file)[0]
+    formats = [profile.get('output_format', 'mp3') for profile in profiles]
+    renditions = []
+    for profile, output_format in zip(profiles, formats):
+        bitrate = profile.get('bitrate', '128k')
+        path = profile.get('output_file')
+        if not path:
+            suffix = f"_{bitrate}" if formats.count(output_format) > 1 else ""
+            path = f"{stem}{suffix}.{output_format}"
+        renditions.append((path, output_format, bitrate))
+    return renditions
+
+
+def _encode_rendition(samples: np.ndarray, frame_rate: int, rendition: tuple) -> str:
+    """将 PCM 编码为一个输出版本"""
+    path, output_format, bitrate = rendition
+    ensure_directory(os.path.dirname(path))
+    with StreamEncoder(path, frame_rate, samples.shape[1], output_format, bitrate) as encoder:
+        encoder.write(samples)
+    return path
+
+
+def text_hash(text: str) -> str:
+    """文本指纹（用于偏移表与增量重渲染时比对台词）"""
+    return hashlib.sha256(text.strip().encode('utf-8')).hexdigest()[:16]
+
+
+def segment_reference(path: str) -> str:
+    """
+    片段文件在偏移表中的引用：相对 SEGMENT_DIR 的路径，不暴露服务器上的绝对路径
+
+    Returns:
+        str: 相对路径（以 / 分隔），文件不在 SEGMENT_DIR 下时返回 None
+    """
+    try:
+        relative = os.path.relpath(os.path.abspath(path), SEGMENT_DIR)
+    except ValueError:
+        return None
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return None
+    return relative.replace(os.sep, '/')
+
+
+def resolve_segment(reference: str) -> str:
+    """
+    将偏移表中的片段引用解析为磁盘路径（旧版偏移表中的绝对路径同样处理）
+
+    Returns:
+        str: 片段文件路径，引用指向 SEGMENT_DIR 之外时返回 None
+    """
+    path = os.path.abspath(os.path.join(SEGMENT_DIR, reference))
+    if os.path.commonpath([path, SEGMENT_DIR]) != SEGMENT_DIR:
+        return None
+    return path
+
+
+def load_segment(item) -> AudioSegment:
+    """
+    加载音频条目
+
+    Args:
+        item: 音频文件路径、AudioBuffer 或 AudioSegment
+
+    Returns:
+        AudioSegment: 解码后的音频
+    """
+    if isinstance(item, AudioSegment):
+        return item
+    if isinstance(item, AudioBuffer):
+        return item.to_segment()
+
+    ext = os.path.splitext(item)[1].lower()
+    if ext == '.mp3':
+        return AudioSegment.from_mp3(item)
+    elif ext == '.wav':
+        return AudioSegment.from_wav(item)
+    return AudioSegment.from_file(item)
+
+
+def _decode_ordered(items: list, workers: int = 1):
+    """
+    并行解码音频条目，按原顺序逐个产出结果
+
+    解码主要耗时在 ffmpeg 子进程中，使用线程池即可占满多核；
+    最多提前解码 2 * workers 个条目，避免流式合并时占用过多内存。
+
+    Args:
+        items: 音频条目列表
+        workers: 并行解码数
+
+    Yields:
+        tuple: (条目, AudioSegment 或 None, 解码异常或 None)
+    """
+    if workers <= 1:
+        for item in items:
+            try:
+                yield item, load_segment(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    iterator = iter(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as executor:
+        pending = deque()
+        for item in iterator:
+            pending.append((item, executor.submit(load_segment, item)))
+            if len(pending) >= workers * 2:
+                break
+
+        while pending:
+            item, future = pending.popleft()
+            next_item = next(iterator, None)
+            if next_item is not None:
+                pending.append((next_item, executor.submit(load_segment, next_item)))
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+
 
 class AdvancedMerger:
     """高级音频合并器"""
@@ -20,13 +207,22 @@ class AdvancedMerger:
         background_music: str = None,
         bgm_volume: float = 0.3,
         output_format: str = 'mp3',
-        bitrate: str = '128k'
-    ) -> str:
+        bitrate: str = '128k',
+        silence_durations: list = None,
+        streaming: bool = None,
+        decode_workers: int = None,
+        stream_copy: bool = None,
+        output_profiles: list = None,
+        segments: list = None,
+        manifest: bool = None,
+        progress=None
+    ) -> dict:
         """
         高级音频合并功能
 
         Args:
-            audio_files: 音频文件路径列表
+            audio_files: 音频列表，元素可以是文件路径、AudioBuffer 或 AudioSegment
+                （内存片段无需写盘和文件检查）
             output_file: 输出文件路径
             silence_duration: 音频段之间的静音间隔（毫秒）
             volume_adjustment: 音量调整系数（1.0为原始音量）
@@ -34,9 +230,34 @@ class AdvancedMerger:
             bgm_volume: 背景音乐音量系数（相对于主音频）
             output_format: 输出格式（mp3, wav等）
             bitrate: 输出比特率（如 '128k', '192k'）
+            silence_durations: 每段之前的静音间隔（毫秒），与 audio_files 一一对应，
+                为 None 的条目使用 silence_duration
+            streaming: 为 True 时逐段解码并送入常驻编码进程，内存占用与总时长无关
+                （默认读取 MERGE_CONFIG['streaming']）
+            decode_workers: 并行解码的线程数（默认读取 MERGE_CONFIG['decode_workers']，
+                未配置时使用 CPU 核数）
+            stream_copy: 音量为 1.0、没有背景音乐、输出 MP3 且所有片段的 MP3 参数一致时，
+                直接拼接 MP3 帧而不解码重编码（默认读取 MERGE_CONFIG['stream_copy']）
+            output_profiles: 多版本输出配置，格式: [{'output_format': 'opus', 'bitrate': '32k',
+                'output_file': 可选}, ...]；指定后只解码混音一次，多个编码器并行输出，
+                忽略 output_format 和 bitrate
+            segments: 与 audio_files 一一对应的分段信息（speaker、text、source_lines），
+                用于生成偏移表
+            manifest: 是否在输出文件旁写入同名 .json 偏移表（默认读取 MERGE_CONFIG['manifest']）
+            progress: 进度回调 progress(已处理段数, 总段数)，每处理完一段调用一次，
+                输出文件写完后以 (总段数, 总段数) 结束
 
         Returns:
-            str: 输出文件路径
+            dict: 合并结果，失败时返回 None，格式: {
+                'output_file': '...',        # 主输出文件（output_profiles 的第一个版本）
+                'outputs': ['...'],          # 所有输出版本的路径
+                'duration_ms': 12345.6,      # 按采样数计算的精确时长
+                'sample_rate': 24000,
+                'segments': [{'index': 0, 'start_ms': 0.0, 'end_ms': 2100.0,
+                              'speaker': 'host', 'text_hash': '...', 'source_lines': [0],
+                              'audio': '片段文件相对 audio/ 的路径（有磁盘副本时）'}, ...],
+                'manifest_file': '...json'   # 未写入时为 None
+            }
         """
 
         info("🎵 高级音频合并器")
@@ -46,16 +267,33 @@ class AdvancedMerger:
             error("没有音频文件需要合并")
             return None
 
+        # 每段之前的静音间隔
+        gaps = list(silence_durations) if silence_durations else [None] * len(audio_files)
+        gaps = [silence_duration if gap is None else gap for gap in gaps]
+
         # 验证音频文件并排序
+        # 只排除空文件；无法解码或解码后没有采样的片段在合并时跳过
         valid_audio_files = []
-        for audio_file in audio_files:
-            if os.path.exists(audio_file):
+        valid_gaps = []
+        valid_indices = []
+        for index, (audio_file, gap) in enumerate(zip(audio_files, gaps)):
+            if isinstance(audio_file, (AudioBuffer, AudioSegment)):
+                # 内存片段：跳过文件大小检查
+                if len(audio_file) > 0:
+                    valid_audio_files.append(audio_file)
+                    valid_gaps.append(gap)
+                    valid_indices.append(index)
+                else:
+                    warning(f"   ⚠️ 跳过空的内存片段: {_describe(audio_file)}")
+            elif os.path.exists(audio_file):
                 file_size = os.path.getsize(audio_file)
-                if file_size > 1000:  # 至少1KB
+                if file_size > 0:
                     valid_audio_files.append(audio_file)
+                    valid_gaps.append(gap)
+                    valid_indices.append(index)
                     info(f"   ✅ 文件: {os.path.basename(audio_file)} ({file_size} bytes)")
                 else:
-                    warning(f"   ⚠️ 跳过文件（太小）: {os.path.basename(audio_file)}")
+                    warning(f"   ⚠️ 跳过空文件: {os.path.basename(audio_file)}")
             else:
                 warning(f"   ⚠️ 文件不存在: {audio_file}")
 
@@ -69,71 +307,197 @@ class AdvancedMerger:
         if background_music:
             info(f"   背景音乐: {os.path.basename(background_music)}")
             info(f"   背景音乐音量: {bgm_volume:.2f}x")
-        info(f"   输出格式: {output_format}")
-        info(f"   比特率: {bitrate}")
-
-        try:
-            # 加载并合并所有音频
-            combined = None
-            total_duration = 0
+        renditions = _resolve_renditions(output_file, output_profiles) if output_profiles else None
+        if renditions:
+            for path, profile_format, profile_bitrate in renditions:
+                info(f"   输出版本: {profile_format} {profile_bitrate} -> {os.path.basename(path)}")
+        else:
+            info(f"   输出格式: {output_format}")
+            info(f"   比特率: {bitrate}")
+
+        if manifest is None:
+            manifest = MERGE_CONFIG.get('manifest', True)
+
+        if stream_copy is None:
+            stream_copy = MERGE_CONFIG.get('stream_copy', True)
+        if (stream_copy and not renditions and volume_adjustment == 1.0
+                and not background_music and output_format == 'mp3'):
+            merged = self._merge_stream_copy(
+                valid_audio_files, valid_gaps, valid_indices, output_file, bitrate, progress
+            )
+            if merged:
+                return self._build_result(merged, audio_files, segments, manifest, progress)
+
+        if decode_workers is None:
+            decode_workers = MERGE_CONFIG.get('decode_workers') or os.cpu_count() or 1
+        decode_workers = max(1, min(decode_workers, len(valid_audio_files)))
+
+        if streaming is None:
+            streaming = MERGE_CONFIG.get('streaming', False)
+        if streaming:
+            merged = self._merge_streaming(
+                valid_audio_files, valid_gaps, valid_indices, volume_adjustment, background_music,
+                bgm_volume, renditions or [(output_file, output_format, bitrate)], decode_workers,
+                progress
+            )
+        else:
+            merged = self._merge_buffered(
+                valid_audio_files, valid_gaps, valid_indices, output_file, volume_adjustment,
+                background_music, bgm_volume, output_format, bitrate, renditions, decode_workers,
+                progress
+            )
+        if merged is None:
+            return None
+        return self._build_result(merged, audio_files, segments, manifest, progress)
 
-            for i, audio_file in enumerate(valid_audio_files):
-                ext = os.path.splitext(audio_file)[1].lower()
-                try:
-                    if ext == '.mp3':
-                        segment = AudioSegment.from_mp3(audio_file)
-                    elif ext == '.wav':
-                        segment = AudioSegment.from_wav(audio_file)
-                    else:
-                        segment = AudioSegment.from_file(audio_file)
+    def _build_result(self, merged: tuple, audio_files: list, segments: list, manifest: bool,
+                      progress=None) -> dict:
+        """
+        根据合并时间线生成结构化结果，并按需写入 JSON 偏移表
 
-                    # 调整音量
-                    segment = segment.apply_gain(20 * (volume_adjustment - 1))
+        Args:
+            merged: (输出路径列表, 采样率, 总帧数, [(输入序号, 起始帧, 结束帧), ...])
+            audio_files: 合并的输入列表（记录每段音频在磁盘上的位置，供增量重渲染复用）
+            segments: 与输入一一对应的分段信息，可为 None
+            manifest: 是否写入偏移表
+            progress: 进度回调（输出完成后报告全部完成）
 
-                    info(f"   处理 {i+1}/{len(valid_audio_files)}: {os.path.basename(audio_file)}")
-                    info(f"      时长: {len(segment)/1000:.2f}秒")
+        Returns:
+            dict: 合并结果
+        """
+        paths, frame_rate, total_frames, timeline = merged
+
+        entries = []
+        for index, start, end in timeline:
+            entry = {
+                'index': index,
+                'start_ms': round(start * 1000 / frame_rate, 3),
+                'end_ms': round(end * 1000 / frame_rate, 3)
+            }
+            item = audio_files[index]
+            audio = item if isinstance(item, str) else getattr(item, 'source', None)
+            reference = segment_reference(audio) if audio else None
+            if reference:
+                entry['audio'] = reference
+            if segments and index < len(segments) and segments[index]:
+                segment = segments[index]
+                entry['speaker'] = segment.get('speaker')
+                entry['text_hash'] = text_hash(segment.get('text', ''))
+                if 'source_lines' in segment:
+                    entry['source_lines'] = segment['source_lines']
+            entries.append(entry)
+
+        result = {
+            'output_file': paths[0],
+            'outputs': paths,
+            'duration_ms': round(total_frames * 1000 / frame_rate, 3),
+            'sample_rate': frame_rate,
+            'segments': entries,
+            'manifest_file': None
+        }
+
+        if manifest:
+            result['manifest_file'] = os.path.splitext(paths[0])[0] + '.json'
+            try:
+                with open(result['manifest_file'], 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False, indent=2)
+                info(f"   📑 偏移表: {result['manifest_file']}")
+            except OSError as e:
+                warning(f"   ⚠️ 写入偏移表失败: {str(e)}")
+                result['manifest_file'] = None
+
+        if progress:
+            progress(len(audio_files), len(audio_files))
+        return result
+
+    def _merge_buffered(
+        self,
+        audio_files: list,
+        gaps: list,
+        indices: list,
+        output_file: str,
+        volume_adjustment: float,
+        background_music: str,
+        bgm_volume: float,
+        output_format: str,
+        bitrate: str,
+        renditions: list,
+        decode_workers: int = 1,
+        progress=None
+    ) -> tuple:
+        """
+        缓冲合并：并行解码后写入预分配的缓冲区，一次混音后导出
 
-                    if combined is None:
-                        combined = segment
-                    else:
-                        # 添加静音间隔并拼接
-                        combined += AudioSegment.silent(duration=silence_duration) + segment
+        Returns:
+            tuple: (输出路径列表, 采样率, 总帧数, [(输入序号, 起始帧, 结束帧), ...])
+        """
+        try:
+            # 并行解码所有音频（按原顺序汇总，加载失败的片段跳过）
+            info(f"   并行解码: {decode_workers} 个线程")
+            segments = []
+            segment_gaps = []
+            segment_indices = []
+            decoded = _decode_ordered(audio_files, decode_workers)
+            for i, ((audio_file, segment, exc), gap, index) in enumerate(zip(decoded, gaps, indices)):
+                # 编码导出尚未完成，解码全部结束时不报告 100%
+                if progress and i + 1 < len(audio_files):
+                    progress(i + 1, len(audio_files))
+                if exc is not None:
+                    warning(f"   ⚠️ 跳过文件（加载失败）: {_describe(audio_file)} - {str(exc)}")
+                    continue
+                if len(segment) == 0:
+                    warning(f"   ⚠️ 跳过文件（没有音频）: {_describe(audio_file)}")
+                    continue
 
-                    total_duration += len(segment) + (silence_duration if i > 0 else 0)
+                info(f"   处理 {i+1}/{len(audio_files)}: {_describe(audio_file)}")
+                info(f"      时长: {len(segment)/1000:.2f}秒")
 
-                except Exception as e:
-                    warning(f"   ⚠️ 跳过文件（加载失败）: {os.path.basename(audio_file)} - {str(e)}")
-                    continue
+                segments.append(segment)
+                segment_gaps.append(gap)
+                segment_indices.append(index)
 
-            if combined is None:
+            if not segments:
                 error("没有成功加载任何音频文件")
                 return None
 
-            # 添加背景音乐
-            if background_music and os.path.exists(background_music):
+            # 统一格式后写入预分配的缓冲区（同时调整音量）
+            frame_rate, channels = common_format(segments)
+            arrays = [segment_to_array(segment, frame_rate, channels) for segment in segments]
+            del segments
+            samples, offsets = render_timeline(
+                arrays, segment_gaps, frame_rate, channels,
+                gain=gain_to_factor(volume_adjustment)
+            )
+            total_frames = len(samples)
+            total_duration = total_frames * 1000 / frame_rate
+            timeline = [(index, start, end) for index, (start, end) in zip(segment_indices, offsets)]
+
+            # 添加背景音乐：循环叠加，并在人声区间内压低（一次向量化混音）
+            bgm = self._load_bgm_array(background_music, frame_rate, channels)
+            if bgm is not None:
                 try:
-                    info("   添加背景音乐...")
-                    bgm = AudioSegment.from_file(background_music)
-
-                    # 调整背景音乐音量
-                    bgm = bgm.apply_gain(20 * (bgm_volume - 1))
-
-                    # 循环背景音乐以匹配总时长
-                    if len(bgm) < len(combined):
-                        # 计算需要循环的次数
-                        loop_count = len(combined) // len(bgm) + 1
-                        bgm = bgm * loop_count
-
-                    # 截取与主音频相同长度的背景音乐
-                    bgm = bgm[:len(combined)]
-
-                    # 混合主音频和背景音乐
-                    combined = combined.overlay(bgm)
+                    envelope = None
+                    if BGM_CONFIG.get('ducking', True):
+                        envelope = ducking_envelope(
+                            len(samples), offsets, BGM_CONFIG.get('duck_gain', 0.35),
+                            ms_to_frames(BGM_CONFIG.get('release_ms', 250), frame_rate),
+                            ms_to_frames(BGM_CONFIG.get('attack_ms', 80), frame_rate)
+                        )
+                    mix_loop(samples, bgm, gain_to_factor(bgm_volume), envelope=envelope)
                     info("   背景音乐添加成功")
 
                 except Exception as e:
                     warning(f"   ⚠️ 添加背景音乐失败: {str(e)}")
 
+            if renditions:
+                paths = self._export_renditions(samples, frame_rate, renditions, len(timeline))
+                if paths is None:
+                    return None
+                return paths, frame_rate, total_frames, timeline
+
+            combined = array_to_segment(samples, frame_rate)
+            del samples
+
             # 导出最终音频
             output_dir = os.path.dirname(output_file)
             ensure_directory(output_dir)
@@ -163,10 +527,10 @@ class AdvancedMerger:
                 return None
 
             info(f"\n✅ 音频合并完成: {output_file}")
-            info(f"   时长: {len(combined)/1000:.2f} 秒")
-            info(f"   合并文件数: {len(valid_audio_files)}")
+            info(f"   时长: {total_duration/1000:.2f} 秒")
+            info(f"   合并文件数: {len(timeline)}")
 
-            return output_file
+            return [output_file], frame_rate, total_frames, timeline
 
         except Exception as e:
             error(f"   ❌ 音频合并失败: {str(e)}")
@@ -174,6 +538,256 @@ class AdvancedMerger:
             traceback.print_exc()
             return None
 
+    def _merge_stream_copy(self, audio_files: list, gaps: list, indices: list, output_file: str,
+                           bitrate: str, progress=None) -> tuple:
+        """
+        直接拼接 MP3 帧（不解码、不重新编码）
+
+        要求所有片段都是 MP3，且 MPEG 版本、采样率、声道数和比特率完全一致，
+        静音间隔用相同参数的预编码静音帧填充（精度为一帧，约 24-48ms）。
+        片段比特率与请求的比特率不同时不适用（输出码率必须与配置一致）。
+        不满足条件或出错时返回 None，由调用方回退到解码合并。
+
+        每个片段的帧中都带有编码器延迟和末尾填充（拼接后无法去掉）：片段有 LAME 标签时，
+        偏移表的起止位置扣除这部分，指向实际语音，与解码合并的偏移一致；静音间隔也扣除这部分。
+        总时长按实际写入的帧计算，因此会比解码合并的结果略长。
+
+        Returns:
+            tuple: (输出路径列表, 采样率, 总帧数, [(输入序号, 起始帧, 结束帧), ...])，
+                帧数以采样为单位
+        """
+        try:
+            chunks = []
+            params = None
+            for audio_file in audio_files:
+                data = _read_mp3_bytes(audio_file)
+                if data is None:
+                    return None
+                header, frames, count = read_frames(data)
+                if header is None:
+                    info(f"   片段不是恒定码率 MP3，使用解码合并: {_describe(audio_file)}")
+                    return None
+                key = (header['version'], header['sample_rate'], header['channels'], header['bitrate'])
+                if params is None:
+                    params, params_key = header, key
+                elif key != params_key:
+                    info(f"   片段的 MP3 参数不一致，使用解码合并: {_describe(audio_file)}")
+                    return None
+                chunks.append((frames, count) + gapless_trim(header))
+
+            if params['bitrate'] != _bitrate_kbps(bitrate):
+                info(f"   片段比特率 {params['bitrate']}kbps 与输出比特率 {bitrate} 不同，使用解码合并")
+                return None
+
+            info("   ⚡ 直接拼接 MP3 帧（跳过解码与重新编码）")
+            info(f"      {params['sample_rate']}Hz / {params['channels']} 声道 / {params['bitrate']}kbps")
+            silence = silence_frame(params['sample_rate'], params['channels'], params['bitrate'])
+            frame_ms = params['samples'] * 1000 / params['sample_rate']
+
+            ensure_directory(os.path.dirname(output_file))
+            samples_per_frame = params['samples']
+            total_frames = 0
+            timeline = []
+            previous_trail = 0
+            with open(output_file, 'wb') as f:
+                for i, ((frames, count, lead, trail), gap, index) in enumerate(zip(chunks, gaps, indices)):
+                    if i > 0 and gap > 0:
+                        # 上一段末尾的填充和本段开头的编码延迟本身就是静音，从间隔中扣除
+                        gap_samples = gap * params['sample_rate'] / 1000 - previous_trail - lead
+                        silence_count = max(0, int(round(gap_samples / samples_per_frame)))
+                        f.write(silence * silence_count)
+                        total_frames += silence_count
+                    f.write(frames)
+                    start = total_frames * samples_per_frame + lead
+                    total_frames += count
+                    end = max(start, total_frames * samples_per_frame - trail)
+                    timeline.append((index, start, end))
+                    previous_trail = trail
+                    if progress and i + 1 < len(chunks):
+                        progress(i + 1, len(chunks))
+
+        except Exception as e:
+            warning(f"   ⚠️ 直接拼接失败，使用解码合并: {str(e)}")
+            return None
+
+        final_size = os.path.getsize(output_file)
+        info(f"   ✅ 导出成功！文件大小: {final_size} bytes ({final_size/1024:.1f} KB)")
+        info(f"\n✅ 音频合并完成: {output_file}")
+        info(f"   时长: {total_frames * frame_ms/1000:.2f} 秒")
+        info(f"   合并文件数: {len(chunks)}")
+        return [output_file], params['sample_rate'], total_frames * samples_per_frame, timeline
+
+    def _export_renditions(self, samples: np.ndarray, frame_rate: int, renditions: list,
+                           merged: int) -> list:
+        """
+        将同一份混音结果并行编码为多个输出版本
+
+        PCM 只转换一次，每个版本各启动一个编码进程，编码在子进程中并行进行。
+
+        Returns:
+            list: 输出路径列表（与 renditions 顺序一致），任一版本失败时返回 None
+        """
+        pcm = np.clip(samples, -32768, 32767).astype(np.int16)
+        del samples
+        info(f"   总时长: {len(pcm)/frame_rate:.2f}秒")
+        info(f"   并行编码 {len(renditions)} 个版本")
+
+        paths = []
+        with ThreadPoolExecutor(max_workers=len(renditions), thread_name_prefix="encode") as executor:
+            futures = [executor.submit(_encode_rendition, pcm, frame_rate, rendition)
+                       for rendition in renditions]
+            for rendition, future in zip(renditions, futures):
+                try:
+                    paths.append(future.result())
+                except Exception as e:
+                    error(f"   ❌ 导出失败 ({rendition[1]} {rendition[2]}): {str(e)}")
+                    paths.append(None)
+
+        if None in paths:
+            return None
+
+        for path in paths:
+            final_size = os.path.getsize(path)
+            info(f"   ✅ 导出成功: {os.path.basename(path)} ({final_size/1024:.1f} KB)")
+        info(f"\n✅ 音频合并完成: {len(paths)} 个版本")
+        info(f"   时长: {len(pcm)/frame_rate:.2f} 秒")
+        info(f"   合并文件数: {merged}")
+        return paths
+
+    def _merge_streaming(
+        self,
+        audio_files: list,
+        gaps: list,
+        indices: list,
+        volume_adjustment: float,
+        background_music: str,
+        bgm_volume: float,
+        renditions: list,
+        decode_workers: int = 1,
+        progress=None
+    ) -> tuple:
+        """
+        流式合并：逐段解码、调整音量、叠加背景音乐后写入常驻编码进程
+
+        任一时刻内存中只有当前片段、背景音乐和编码器缓冲，适合长时间的播客。
+        每个输出版本对应一个编码进程，同一份 PCM 依次写入所有编码器。
+        输出格式以第一个成功解码的片段为准，其余片段转换到相同的采样率和声道数。
+        解码在线程池中提前进行，最多同时持有 2 * decode_workers 个已解码片段。
+
+        Args:
+            renditions: [(输出路径, 格式, 比特率), ...]
+
+        Returns:
+            tuple: (输出路径列表, 采样率, 总帧数, [(输入序号, 起始帧, 结束帧), ...])
+        """
+        info("   🌊 流式合并模式")
+        for path, _, _ in renditions:
+            ensure_directory(os.path.dirname(path))
+
+        gain = gain_to_factor(volume_adjustment)
+        bgm_gain = gain_to_factor(bgm_volume)
+        ducking = BGM_CONFIG.get('ducking', True)
+        duck_gain = BGM_CONFIG.get('duck_gain', 0.35)
+        encoders = []
+        bgm = None
+        timeline = []
+
+        try:
+            decoded = _decode_ordered(audio_files, decode_workers)
+            for i, ((audio_file, segment, exc), gap, index) in enumerate(zip(decoded, gaps, indices)):
+                if progress and i + 1 < len(audio_files):
+                    progress(i + 1, len(audio_files))
+                if exc is not None:
+                    warning(f"   ⚠️ 跳过文件（加载失败）: {_describe(audio_file)} - {str(exc)}")
+                    continue
+                if len(segment) == 0:
+                    warning(f"   ⚠️ 跳过文件（没有音频）: {_describe(audio_file)}")
+                    continue
+
+                info(f"   处理 {i+1}/{len(audio_files)}: {_describe(audio_file)}")
+                info(f"      时长: {len(segment)/1000:.2f}秒")
+
+                if not encoders:
+                    # 第一个片段决定输出的采样率和声道数
+                    frame_rate, channels = segment.frame_rate, segment.channels
+                    for path, output_format, bitrate in renditions:
+                        encoders.append(StreamEncoder(path, frame_rate, channels, output_format, bitrate))
+                    bgm = self._load_bgm_array(background_music, frame_rate, channels)
+                    release_frames = ms_to_frames(BGM_CONFIG.get('release_ms', 250), frame_rate)
+                    attack_frames = ms_to_frames(BGM_CONFIG.get('attack_ms', 80), frame_rate)
+
+                samples = segment_to_array(segment, frame_rate, channels).astype(np.float32)
+                del segment
+                if gain != 1.0:
+                    samples *= gain
+                position = encoders[0].frames_written
+
+                # 静音间隔（第一个片段之前没有间隔）
+                if timeline and gap > 0:
+                    gap_frames = ms_to_frames(gap, frame_rate)
+                    if bgm is None:
+                        for encoder in encoders:
+                            encoder.write_silence(gap_frames)
+                    else:
+                        silence = np.zeros((gap_frames, channels), dtype=np.float32)
+                        envelope = None
+                        if ducking:
+                            envelope = gap_envelope(gap_frames, duck_gain, release_frames, attack_frames)
+                        mix_loop(silence, bgm, bgm_gain, offset=position, envelope=envelope)
+                        silence = np.clip(silence, -32768, 32767).astype(np.int16)
+                        for encoder in encoders:
+                            encoder.write(silence)
+                    position += gap_frames
+
+                if bgm is not None:
+                    # 人声区间内背景音乐保持压低
+                    mix_loop(samples, bgm, bgm_gain, offset=position,
+                             envelope=duck_gain if ducking else None)
+                samples = np.clip(samples, -32768, 32767).astype(np.int16)
+                for encoder in encoders:
+                    encoder.write(samples)
+                timeline.append((index, position, position + len(samples)))
+
+            if not encoders:
+                error("没有成功加载任何音频文件")
+                return None
+
+            for encoder in encoders:
+                info(f"   正在完成编码: {encoder.output_file}")
+                encoder.close()
+
+        except Exception as e:
+            error(f"   ❌ 流式合并失败: {str(e)}")
+            for encoder in encoders:
+                encoder.abort()
+            import traceback
+            traceback.print_exc()
+            return None
+
+        paths = [path for path, _, _ in renditions]
+        for path in paths:
+            if not os.path.exists(path):
+                error(f"   ❌ 导出失败！")
+                return None
+            final_size = os.path.getsize(path)
+            info(f"   ✅ 导出成功！文件大小: {final_size} bytes ({final_size/1024:.1f} KB)")
+
+        info(f"\n✅ 音频合并完成: {', '.join(paths)}")
+        info(f"   时长: {encoders[0].duration_ms/1000:.2f} 秒")
+        info(f"   合并文件数: {len(timeline)}")
+        return paths, frame_rate, encoders[0].frames_written, timeline
+
+    def _load_bgm_array(self, background_music: str, frame_rate: int, channels: int):
+        """获取解码后的背景音乐（优先使用缓存；未设置或加载失败时返回 None）"""
+        if not background_music or not os.path.exists(background_music):
+            return None
+        try:
+            info(f"   加载背景音乐: {os.path.basename(background_music)}")
+            return bgm_cache.get(background_music, frame_rate, channels)
+        except Exception as e:
+            warning(f"   ⚠️ 添加背景音乐失败: {str(e)}")
+            return None
+
 
 # 创建全局实例
 advanced_merger = AdvancedMerger()
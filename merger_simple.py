@@ -4,6 +4,7 @@ import os
 from pydub import AudioSegment
 from utils.log_utils import info, error, warning
 from utils.file_utils import ensure_directory
+from utils.pcm_mixer import common_format, segment_to_array, array_to_segment, render_timeline
 
 def merge_audio(audio_files: list, output_file: str, silence_duration: int = 100):
     """
@@ -50,18 +51,19 @@ def merge_audio(audio_files: list, output_file: str, silence_duration: int = 100
 
         try:
             if ext == '.mp3':
-                combined = AudioSegment.from_mp3(first_file)
+                first = AudioSegment.from_mp3(first_file)
             elif ext == '.wav':
-                combined = AudioSegment.from_wav(first_file)
+                first = AudioSegment.from_wav(first_file)
             else:
-                combined = AudioSegment.from_file(first_file)
+                first = AudioSegment.from_file(first_file)
 
             info(f"   加载第一个音频: {os.path.basename(first_file)}")
         except Exception as e:
             error(f"   ❌ 加载音频文件失败: {str(e)}")
             return None
 
-        # 依次拼接后续音频，添加静音间隔
+        # 依次加载后续音频
+        segments = [first]
         for i, audio_file in enumerate(valid_audio_files[1:], 1):
             ext = os.path.splitext(audio_file)[1].lower()
             try:
@@ -73,13 +75,19 @@ def merge_audio(audio_files: list, output_file: str, silence_duration: int = 100
                     segment = AudioSegment.from_file(audio_file)
 
                 info(f"   拼接 {i+1}/{len(valid_audio_files)}: {os.path.basename(audio_file)}")
-
-                # 添加静音间隔并拼接
-                combined += AudioSegment.silent(duration=silence_duration) + segment
+                segments.append(segment)
             except Exception as e:
                 warning(f"   ⚠️ 跳过文件（加载失败）: {os.path.basename(audio_file)} - {str(e)}")
                 continue
 
+        # 一次性写入预分配的缓冲区，段与段之间留出静音间隔
+        frame_rate, channels = common_format(segments)
+        arrays = [segment_to_array(segment, frame_rate, channels) for segment in segments]
+        del segments, first
+        samples, _ = render_timeline(arrays, [silence_duration] * len(arrays), frame_rate, channels)
+        combined = array_to_segment(samples, frame_rate)
+        del samples
+
         # 导出最终音频
         output_dir = os.path.dirname(output_file)
         ensure_directory(output_dir)
@@ -0,0 +1,462 @@
+# pipeline.py - 播客生成流水线：对话生成 → 语音合成 → 音频合并
+
+import os
+import re
+import json
+import uuid
+from io import BytesIO
+from generator import generate_dialogue
+from merger_advanced import merge_audio_advanced, load_segment, text_hash
+from segmenter import segment_dialogue, SEGMENT_CONFIG
+from utils.pcm_mixer import segment_to_array, array_to_segment, ms_to_frames
+from utils.stream_encoder import StreamEncoder
+from utils.mp3_frames import read_frames, silence_frame, gapless_trim
+from utils.file_utils import content_hash, ensure_directory
+from utils.retention import pins
+from utils.log_utils import info, error, warning
+
+# 生成的播客输出目录
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "output")
+
+# 按内容命名的输出文件：podcast_<sha256 前 20 位>.<扩展名>，内容不变则文件名不变；
+# 文件按哈希前两位分散到子目录（output/ab/podcast_ab....mp3）
+CONTENT_HASH_LENGTH = 20
+CONTENT_NAME_PATTERN = re.compile(r'^podcast_([0-9a-f]{%d})\.[0-9a-z]+$' % CONTENT_HASH_LENGTH)
+
+# 可通过 /api/audio/ 获取的输出格式 -> 媒体类型（同名的 .json 偏移表只供服务器内部使用）
+FORMAT_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "ogg": "audio/ogg",
+    "wav": "audio/wav",
+    "m4a": "audio/mp4",
+    "aac": "audio/aac",
+    "flac": "audio/flac"
+}
+
+
+def output_path(filename: str) -> str:
+    """
+    根据输出文件名找到磁盘路径（按内容命名的文件位于分片子目录，旧文件位于 output/ 根目录）
+
+    Args:
+        filename: 文件名（路径部分会被去掉）
+
+    Returns:
+        str: 文件路径（文件可能不存在）
+    """
+    filename = os.path.basename(filename)
+    match = CONTENT_NAME_PATTERN.match(filename)
+    if match:
+        path = os.path.join(OUTPUT_DIR, match.group(1)[:2], filename)
+        if os.path.exists(path):
+            return path
+    return os.path.join(OUTPUT_DIR, filename)
+
+
+def temporary_output(ext: str = 'mp3') -> str:
+    """合并输出的临时路径（合并完成后由 publish_output 改为按内容命名）"""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    return os.path.join(OUTPUT_DIR, f".render_{uuid.uuid4().hex[:8]}.{ext}")
+
+
+def publish_output(result: dict) -> str:
+    """
+    将合并结果改为按内容命名，同时移动并更新偏移表
+
+    相同内容的文件已存在时直接复用，删除本次的临时文件。
+
+    Args:
+        result: merge_audio_advanced 的返回值（原地更新 output_file、outputs 和 manifest_file）
+
+    Returns:
+        str: 按内容命名的文件名
+    """
+    renamed = []
+    for path in result['outputs']:
+        ext = os.path.splitext(path)[1]
+        digest = content_hash(path)[:CONTENT_HASH_LENGTH]
+        shard = os.path.join(os.path.dirname(path), digest[:2])
+        ensure_directory(shard)
+        target = os.path.join(shard, f"podcast_{digest}{ext}")
+        if os.path.abspath(path) != os.path.abspath(target):
+            try:
+                os.replace(path, target)
+            except FileNotFoundError:
+                # 清理器恰好删除了空的分片目录
+                ensure_directory(shard)
+                os.replace(path, target)
+        renamed.append(target)
+
+    old_manifest = result.get('manifest_file')
+    result['output_file'] = renamed[0]
+    result['outputs'] = renamed
+    if old_manifest:
+        result['manifest_file'] = os.path.splitext(renamed[0])[0] + '.json'
+        try:
+            with open(result['manifest_file'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            if os.path.abspath(old_manifest) != os.path.abspath(result['manifest_file']):
+                os.remove(old_manifest)
+        except OSError as e:
+            warning(f"   ⚠️ 移动偏移表失败: {str(e)}")
+
+    return os.path.basename(renamed[0])
+
+
+def public_segments(segments: list) -> list:
+    """去掉偏移表中只供服务器内部使用的字段（片段文件位置），用于返回给客户端"""
+    return [{key: value for key, value in entry.items() if key != 'audio'} for entry in segments]
+
+
+class PipelineError(Exception):
+    """流水线某个阶段失败（消息可直接返回给客户端）"""
+
+
+def create_dialogue(script: str) -> list:
+    """
+    对话生成阶段（调用 LLM）
+
+    Raises:
+        PipelineError: 对话生成失败
+    """
+    dialogue = generate_dialogue(script)
+    if not dialogue:
+        raise PipelineError("对话生成失败")
+
+    info(f"✅ 成功生成 {len(dialogue)} 段对话")
+    return dialogue
+
+
+def synthesize_podcast(dialogue: list, tts_engine, in_memory: bool = False, progress=None) -> dict:
+    """
+    语音合成阶段：先分段（合并短句、拆分长句），再并发合成，结果按顺序返回
+
+    Args:
+        dialogue: 对话列表
+        tts_engine: TTS 引擎实例
+        in_memory: 合成结果是否以内存片段交给合并器
+        progress: 进度回调 progress(已完成段数, 总段数)
+
+    Returns:
+        dict: {audio_files, silence_durations, segments}，只包含合成成功的分段
+
+    Raises:
+        PipelineError: 所有分段都合成失败
+    """
+    segments = segment_dialogue(dialogue) if SEGMENT_CONFIG.get('enabled', True) else dialogue
+    if progress:
+        progress(0, len(segments))
+    audio_paths = tts_engine.synthesize_dialogue(segments, in_memory=in_memory, progress=progress)
+    audio_files = []
+    silence_durations = []
+    merged_segments = []
+    for segment, audio_path in zip(segments, audio_paths):
+        if audio_path:
+            audio_files.append(audio_path)
+            silence_durations.append(segment.get('gap_before'))
+            merged_segments.append(segment)
+        else:
+            error(f"   ❌ 语音生成失败: {segment['text']}")
+
+    if not audio_files:
+        raise PipelineError("音频生成失败")
+
+    return {
+        'audio_files': audio_files,
+        'silence_durations': silence_durations,
+        'segments': merged_segments
+    }
+
+
+def merge_podcast(synthesized: dict, progress=None) -> dict:
+    """
+    音频合并阶段
+
+    Args:
+        synthesized: synthesize_podcast 的返回值
+        progress: 进度回调 progress(已处理段数, 总段数)
+
+    Returns:
+        dict: {output_file, audio_filename, duration, segments}
+
+    Raises:
+        PipelineError: 合并失败
+    """
+    info(f"🎵 正在合并音频...")
+    audio_files = synthesized['audio_files']
+    output_file = temporary_output("mp3")
+    # 合并期间保护片段文件和输出文件，避免被清理器删除
+    sources = [item if isinstance(item, str) else getattr(item, 'source', None) for item in audio_files]
+    with pins.hold(sources + [output_file]):
+        result = merge_audio_advanced(
+            audio_files,
+            output_file,
+            silence_duration=100,
+            volume_adjustment=1.0,
+            output_format="mp3",
+            bitrate="128k",
+            silence_durations=synthesized['silence_durations'],
+            segments=synthesized['segments'],
+            progress=progress
+        )
+        if not result:
+            raise PipelineError("音频合并失败")
+
+        output_filename = publish_output(result)
+    info(f"✅ 播客生成完成: {output_filename}")
+
+    return {
+        'output_file': result['output_file'],
+        'audio_filename': output_filename,
+        # 实际时长（按采样数计算）
+        'duration': result['duration_ms'] / 1000,
+        'segments': public_segments(result['segments'])
+    }
+
+
+def generate_podcast(script: str, tts_engine, in_memory: bool = False, progress=None) -> dict:
+    """
+    根据脚本生成播客音频（依次执行对话生成、语音合成和音频合并）
+
+    Args:
+        script: 播客脚本
+        tts_engine: TTS 引擎实例
+        in_memory: 合成结果是否以内存片段交给合并器
+        progress: 进度回调 progress(阶段, **详情)，阶段依次为
+            'dialogue'、'tts'（lines_done, lines_total）、'merge'（merge_percent）
+
+    Returns:
+        dict: {dialogue, output_file, audio_filename, duration, segments}
+
+    Raises:
+        PipelineError: 对话生成、语音合成或音频合并失败
+    """
+    report = progress or (lambda stage, **details: None)
+
+    report('dialogue')
+    dialogue = create_dialogue(script)
+
+    synthesized = synthesize_podcast(
+        dialogue, tts_engine, in_memory=in_memory,
+        progress=lambda done, total: report('tts', lines_done=done, lines_total=total)
+    )
+
+    report('merge', merge_percent=0)
+    result = merge_podcast(
+        synthesized,
+        progress=lambda done, total: report('merge', merge_percent=round(done * 100 / total, 1))
+    )
+    return {'dialogue': dialogue, **result}
+
+
+def stream_podcast(dialogue: list, tts_engine, sink, output_format: str = 'mp3', bitrate: str = '128k',
+                   in_memory: bool = True, silence_duration: int = 100, cancelled=None) -> dict:
+    """
+    边合成边编码：某一句及之前的所有句子都合成完成后，立即将它（连同之前的静音间隔）
+    送入常驻编码进程，编码结果通过 sink 持续输出
+
+    输出的采样率和声道数以第一个成功解码的片段为准；合成或解码失败的句子被跳过。
+
+    Args:
+        dialogue: 对话列表
+        tts_engine: TTS 引擎实例
+        sink: 编码输出回调 sink(bytes)（在编码器的输出线程中调用）
+        output_format: 输出格式（mp3, opus 等，见 StreamEncoder）
+        bitrate: 输出比特率
+        in_memory: 合成结果是否以内存片段交给编码器
+        silence_duration: 分段未指定 gap_before 时的静音间隔（毫秒）
+        cancelled: threading.Event，被设置时停止合成并终止编码（如客户端断开）
+
+    Returns:
+        dict: {duration_ms, sample_rate, segments}，segments 的格式与合并器的偏移表一致；
+            被取消时返回 None
+
+    Raises:
+        PipelineError: 没有任何句子合成成功
+    """
+    segments = segment_dialogue(dialogue) if SEGMENT_CONFIG.get('enabled', True) else dialogue
+    results = tts_engine.iter_dialogue(segments, in_memory=in_memory)
+    encoder = None
+    timeline = []
+
+    try:
+        for index, (segment, audio) in enumerate(zip(segments, results)):
+            if cancelled is not None and cancelled.is_set():
+                info("   ⏹️ 客户端已断开，停止流式生成")
+                if encoder:
+                    encoder.abort()
+                return None
+            if not audio:
+                error(f"   ❌ 语音生成失败: {segment['text']}")
+                continue
+            try:
+                decoded = load_segment(audio)
+            except Exception as e:
+                warning(f"   ⚠️ 跳过片段（加载失败）: {segment['text'][:20]} - {str(e)}")
+                continue
+            if len(decoded) == 0:
+                continue
+
+            if encoder is None:
+                # 第一个片段决定输出的采样率和声道数
+                frame_rate, channels = decoded.frame_rate, decoded.channels
+                encoder = StreamEncoder(None, frame_rate, channels, output_format, bitrate, sink=sink)
+                info(f"   🌊 开始流式输出: {output_format} {bitrate}, {frame_rate}Hz / {channels} 声道")
+
+            gap = segment.get('gap_before')
+            gap = silence_duration if gap is None else gap
+            if timeline and gap > 0:
+                encoder.write_silence(ms_to_frames(gap, frame_rate))
+            start = encoder.frames_written
+            encoder.write(segment_to_array(decoded, frame_rate, channels))
+
+            entry = {
+                'index': index,
+                'start_ms': round(start * 1000 / frame_rate, 3),
+                'end_ms': round(encoder.frames_written * 1000 / frame_rate, 3),
+                'speaker': segment.get('speaker'),
+                'text_hash': text_hash(segment.get('text', ''))
+            }
+            if 'source_lines' in segment:
+                entry['source_lines'] = segment['source_lines']
+            timeline.append(entry)
+
+        if encoder is None:
+            raise PipelineError("音频生成失败")
+        encoder.close()
+
+    except Exception:
+        if encoder:
+            encoder.abort()
+        raise
+    finally:
+        results.close()
+
+    info(f"✅ 流式生成完成: {len(timeline)} 段, {encoder.duration_ms/1000:.2f} 秒")
+    return {
+        'duration_ms': round(encoder.duration_ms, 3),
+        'sample_rate': frame_rate,
+        'segments': timeline
+    }
+
+
+def _encode_frames(samples, frame_rate: int, bitrate: str) -> tuple:
+    """
+    将一句的 PCM 编码为独立的 MP3 帧（关闭比特池，帧可以直接拼接在其他帧之后）
+
+    保留 Xing/LAME 信息帧，read_frames 从中读取编码器延迟和填充后将其去掉。
+
+    Returns:
+        tuple: (帧参数 dict, 音频帧字节, 帧数)
+    """
+    buffer = BytesIO()
+    array_to_segment(samples, frame_rate).export(
+        buffer, format='mp3', bitrate=bitrate,
+        parameters=['-reservoir', '0', '-id3v2_version', '0']
+    )
+    header, frames, count = read_frames(buffer.getvalue())
+    if header is None:
+        raise RuntimeError("编码结果不是恒定码率 MP3")
+    return header, frames, count
+
+
+def stream_podcast_frames(segments: list, tts_engine, emit, bitrate: str = '128k', in_memory: bool = True,
+                          silence_duration: int = 100, cancelled=None) -> dict:
+    """
+    边合成边按句输出 MP3 帧
+
+    与 stream_podcast 不同，每一句单独编码为完整的 MP3 帧，句子之间的静音用预编码的
+    静音帧填充（精度为一帧），因此每条消息都在帧边界上，客户端可以按句拼接播放。
+    偏移表的起止位置扣除每句帧中的编码器延迟和末尾填充，指向实际语音。
+
+    Args:
+        segments: 分段后的对话列表（见 segment_dialogue）
+        tts_engine: TTS 引擎实例
+        emit: 回调 emit(条目, 数据)：成功时条目与偏移表格式一致，数据为该句（含之前的静音）的 MP3 帧；
+            失败时条目为 {'index', 'error'}，数据为 None
+        bitrate: 输出比特率
+        in_memory: 合成结果是否以内存片段交给编码器
+        silence_duration: 分段未指定 gap_before 时的静音间隔（毫秒）
+        cancelled: threading.Event，被设置时停止合成
+
+    Returns:
+        dict: {duration_ms, sample_rate, segments}；被取消时返回 None
+
+    Raises:
+        PipelineError: 没有任何句子合成成功
+    """
+    results = tts_engine.iter_dialogue(segments, in_memory=in_memory)
+    params = None
+    total_samples = 0
+    previous_trail = 0
+    timeline = []
+
+    try:
+        for index, (segment, audio) in enumerate(zip(segments, results)):
+            if cancelled is not None and cancelled.is_set():
+                info("   ⏹️ 客户端已断开，停止实时生成")
+                return None
+            if not audio:
+                error(f"   ❌ 语音生成失败: {segment['text']}")
+                emit({'index': index, 'error': "语音生成失败"}, None)
+                continue
+            try:
+                decoded = load_segment(audio)
+                if len(decoded) == 0:
+                    raise ValueError("没有音频")
+                if params is None:
+                    # 第一个片段决定输出的采样率和声道数
+                    frame_rate, channels = decoded.frame_rate, decoded.channels
+                header, frames, count = _encode_frames(
+                    segment_to_array(decoded, frame_rate, channels), frame_rate, bitrate
+                )
+            except Exception as e:
+                warning(f"   ⚠️ 跳过片段（编码失败）: {segment['text'][:20]} - {str(e)}")
+                emit({'index': index, 'error': "音频编码失败"}, None)
+                continue
+
+            if params is None:
+                params = header
+                silence = silence_frame(header['sample_rate'], header['channels'], header['bitrate'])
+
+            lead, trail = gapless_trim(header)
+            gap = segment.get('gap_before')
+            gap = silence_duration if gap is None else gap
+            data = frames
+            if timeline and gap > 0:
+                # 上一句末尾的填充和本句开头的编码延迟本身就是静音，从间隔中扣除
+                gap_samples = gap * params['sample_rate'] / 1000 - previous_trail - lead
+                silence_count = max(0, int(round(gap_samples / params['samples'])))
+                data = silence * silence_count + frames
+                total_samples += silence_count * params['samples']
+
+            start = total_samples + lead
+            total_samples += count * params['samples']
+            end = max(start, total_samples - trail)
+            previous_trail = trail
+            entry = {
+                'index': index,
+                'start_ms': round(start * 1000 / params['sample_rate'], 3),
+                'end_ms': round(end * 1000 / params['sample_rate'], 3),
+                'speaker': segment.get('speaker'),
+                'text_hash': text_hash(segment.get('text', ''))
+            }
+            if 'source_lines' in segment:
+                entry['source_lines'] = segment['source_lines']
+            timeline.append(entry)
+            emit(entry, data)
+
+    finally:
+        results.close()
+
+    if params is None:
+        raise PipelineError("音频生成失败")
+
+    duration_ms = round(total_samples * 1000 / params['sample_rate'], 3)
+    info(f"✅ 实时生成完成: {len(timeline)} 段, {duration_ms/1000:.2f} 秒")
+    return {
+        'duration_ms': duration_ms,
+        'sample_rate': params['sample_rate'],
+        'segments': timeline
+    }
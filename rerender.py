@@ -0,0 +1,137 @@
+# rerender.py - 增量重渲染：只重新合成修改过的台词
+
+import os
+import json
+from collections import defaultdict, deque
+from merger_advanced import merge_audio_advanced, text_hash, resolve_segment
+from segmenter import segment_dialogue, SEGMENT_CONFIG
+from utils.retention import pins
+from utils.log_utils import info, warning, error
+
+
+def load_manifest(manifest_file: str) -> dict:
+    """
+    读取合并时写入的偏移表
+
+    Args:
+        manifest_file: 偏移表路径（或对应的音频文件路径）
+
+    Returns:
+        dict: 偏移表内容，不存在或无法解析时返回 None
+    """
+    if not manifest_file.endswith('.json'):
+        manifest_file = os.path.splitext(manifest_file)[0] + '.json'
+    if not os.path.exists(manifest_file):
+        return None
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        warning(f"⚠️ 偏移表无法读取: {manifest_file} - {str(e)}")
+        return None
+
+
+def plan_rerender(segments: list, manifest: dict) -> list:
+    """
+    将新的分段与上一次渲染的偏移表比对
+
+    说话人和文本指纹都相同、且片段文件仍在磁盘上的分段直接复用；
+    同一句台词出现多次时按出现顺序依次匹配。
+
+    Args:
+        segments: 新的分段列表
+        manifest: 上一次渲染的偏移表
+
+    Returns:
+        list: 与 segments 一一对应，可复用的片段文件路径，需要重新合成的为 None
+    """
+    previous = defaultdict(deque)
+    for entry in (manifest or {}).get('segments', []):
+        audio = resolve_segment(entry['audio']) if entry.get('audio') else None
+        if audio and entry.get('text_hash'):
+            previous[(entry.get('speaker'), entry['text_hash'])].append(audio)
+
+    plan = []
+    for segment in segments:
+        candidates = previous.get((segment['speaker'], text_hash(segment['text'])))
+        reused = None
+        while candidates:
+            audio = candidates.popleft()
+            if os.path.exists(audio):
+                reused = audio
+                break
+        plan.append(reused)
+    return plan
+
+
+def rerender_podcast(dialogue: list, previous: str, output_file: str, tts_engine,
+                     in_memory: bool = False, **merge_options) -> dict:
+    """
+    根据修改后的对话重新生成播客，只合成新增或修改过的台词
+
+    未修改的分段直接使用上一次渲染留下的片段文件，合成成本与修改量成正比；
+    合并阶段仍会处理全部片段（MP3 直接拼接或 PCM 拷贝，接近 I/O 速度）。
+
+    Args:
+        dialogue: 修改后的对话列表，格式: [{'speaker': 'host', 'text': '...'}, ...]
+        previous: 上一次渲染的输出文件或偏移表路径
+        output_file: 新的输出文件路径
+        tts_engine: TTS 引擎实例
+        in_memory: 新合成的片段是否以内存片段交给合并器
+        **merge_options: 传给 merge_audio_advanced 的其他参数
+
+    Returns:
+        dict: 合并结果（见 merge_audio_advanced），额外包含 reused 和 synthesized 计数；
+            失败时返回 None
+    """
+    manifest = load_manifest(previous)
+    if manifest is None:
+        warning(f"⚠️ 找不到上一次渲染的偏移表，将完整重新生成: {os.path.basename(previous)}")
+
+    segments = segment_dialogue(dialogue) if SEGMENT_CONFIG.get('enabled', True) else dialogue
+    plan = plan_rerender(segments, manifest)
+
+    # 重渲染期间保护要复用的片段文件，避免被清理器删除
+    with pins.hold(list(plan) + [output_file]):
+        return _rerender(segments, plan, tts_engine, output_file, in_memory, merge_options)
+
+
+def _rerender(segments: list, plan: list, tts_engine, output_file: str, in_memory: bool,
+              merge_options: dict) -> dict:
+    """合成需要更新的分段并合并（plan 中可复用的条目为文件路径，其余为 None）"""
+    changed = [i for i, audio in enumerate(plan) if audio is None]
+    info(f"🔁 增量重渲染: 共 {len(segments)} 段，复用 {len(segments) - len(changed)} 段，"
+         f"重新合成 {len(changed)} 段")
+
+    results = tts_engine.synthesize_dialogue([segments[i] for i in changed], in_memory=in_memory)
+    for i, audio in zip(changed, results):
+        plan[i] = audio
+
+    audio_files = []
+    silence_durations = []
+    merged_segments = []
+    for segment, audio in zip(segments, plan):
+        if audio:
+            audio_files.append(audio)
+            silence_durations.append(segment.get('gap_before'))
+            merged_segments.append(segment)
+        else:
+            error(f"   ❌ 语音生成失败: {segment['text']}")
+
+    if not audio_files:
+        return None
+
+    merge_options.setdefault('silence_duration', 100)
+    result = merge_audio_advanced(
+        audio_files,
+        output_file,
+        silence_durations=silence_durations,
+        segments=merged_segments,
+        **merge_options
+    )
+    if not result:
+        return None
+
+    result['reused'] = len(segments) - len(changed)
+    result['synthesized'] = sum(1 for audio in results if audio)
+    return result
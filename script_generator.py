@@ -4,6 +4,25 @@ from dashscope import Generation
 from config import DASHSCOPE_API_KEY, DASHSCOPE_MODEL
 from utils.log_utils import info, error
 
+# 语速：每分钟约 180 字（中文播客的平均语速）
+CHARS_PER_MINUTE = 180
+
+
+def estimate_duration(dialogue: list, silence_ms: int = 100) -> float:
+    """
+    按字数估算对话的朗读时长
+
+    Args:
+        dialogue: 对话列表，格式: [{'speaker': 'host', 'text': '...'}, ...]
+        silence_ms: 每段之间的静音间隔（毫秒）
+
+    Returns:
+        float: 预估时长（秒）
+    """
+    chars = sum(len(line['text'].strip()) for line in dialogue)
+    pauses = max(0, len(dialogue) - 1) * silence_ms / 1000
+    return chars * 60 / CHARS_PER_MINUTE + pauses
+
 
 def generate_podcast_script(theme: str, duration_minutes: int = 5) -> dict:
     """
@@ -18,7 +37,7 @@ def generate_podcast_script(theme: str, duration_minutes: int = 5) -> dict:
     """
     try:
         # 计算需要的字数（平均每分钟 150-200 字，对话形式需要更多）
-        target_length = duration_minutes * 180  # 每分钟 180 字
+        target_length = duration_minutes * CHARS_PER_MINUTE
 
         info(f"📝 正在生成播客脚本...")
         info(f"   主题: {theme}")
@@ -86,8 +105,8 @@ def generate_podcast_script(theme: str, duration_minutes: int = 5) -> dict:
                         'text': line[5:].strip()
                     })
 
-            # 计算实际时长（平均每段 3 秒）
-            estimated_duration = len(dialogue) * 3.0
+            # 按字数估算时长
+            estimated_duration = estimate_duration(dialogue)
 
             info(f"✅ 脚本生成完成")
             info(f"   实际字数: {len(script_text)} 字")
@@ -0,0 +1,130 @@
+# segmenter.py - 对话分段：合并短句、拆分长句
+
+import re
+import config
+from utils.log_utils import info
+
+# 分段配置
+SEGMENT_CONFIG = getattr(config, 'SEGMENT_CONFIG', {})
+
+# 句末标点（优先在这里拆分）与句中停顿标点（句子仍然过长时使用）
+SENTENCE_ENDINGS = '。！？!?；;…'
+CLAUSE_BREAKS = '，,、：:'
+
+
+def _split_after(text: str, marks: str) -> list:
+    """在指定标点之后切分文本（标点保留在前一段末尾）"""
+    parts = re.split(f"(?<=[{re.escape(marks)}])", text)
+    return [part for part in parts if part.strip()]
+
+
+def _pack(pieces: list, max_chars: int) -> list:
+    """把相邻的小片段贪心合并为不超过 max_chars 的块"""
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text: str, max_chars: int) -> list:
+    """
+    将过长的文本在标点处拆分为多个块
+
+    先按句末标点拆分，单句仍超长时按逗号等停顿拆分，最后才按长度硬切。
+
+    Args:
+        text: 文本
+        max_chars: 每块最大字数
+
+    Returns:
+        list: 文本块列表（按原顺序拼接即为原文）
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    pieces = []
+    for sentence in _split_after(text, SENTENCE_ENDINGS):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in _split_after(sentence, CLAUSE_BREAKS):
+            if len(clause) <= max_chars:
+                pieces.append(clause)
+            else:
+                pieces.extend(clause[i:i + max_chars] for i in range(0, len(clause), max_chars))
+
+    return _pack(pieces, max_chars)
+
+
+def _join(left: str, right: str) -> str:
+    """拼接同一说话人的两句话，前一句没有标点结尾时补一个逗号作为停顿"""
+    if left and left[-1] not in SENTENCE_ENDINGS + CLAUSE_BREAKS:
+        return f"{left}，{right}"
+    return left + right
+
+
+def segment_dialogue(dialogue: list, target_chars: int = None, max_chars: int = None,
+                     split_gap: int = None) -> list:
+    """
+    对话分段：合并同一说话人相邻的短句，拆分过长的句子
+
+    合并后的块最多 target_chars 字，减少 TTS 调用次数；超过 max_chars 的句子
+    拆分为可并行合成的多个块。每个块都记录对应的原始对话行。
+
+    Args:
+        dialogue: 对话列表，格式: [{'speaker': 'host', 'text': '...'}, ...]
+        target_chars: 合并短句的目标字数
+        max_chars: 单个块的最大字数
+        split_gap: 同一句拆分出的块之间的静音间隔（毫秒）
+
+    Returns:
+        list: 分段列表，格式: [{
+            'speaker': 'host',
+            'text': '...',
+            'source_lines': [0, 1],   # 对应的原始对话行下标
+            'part': 0,                # 拆分块在原句中的序号（未拆分为 0）
+            'parts': 1,               # 原句被拆分的块数
+            'gap_before': None        # 与前一块之间的静音（毫秒），None 表示使用默认间隔
+        }, ...]
+    """
+    target_chars = target_chars or SEGMENT_CONFIG.get('target_chars', 60)
+    max_chars = max(target_chars, max_chars or SEGMENT_CONFIG.get('max_chars', 120))
+    split_gap = split_gap if split_gap is not None else SEGMENT_CONFIG.get('split_gap', 0)
+
+    segments = []
+    for index, line in enumerate(dialogue):
+        text = line['text'].strip()
+        if not text:
+            continue
+
+        previous = segments[-1] if segments else None
+        if (previous is not None
+                and previous['speaker'] == line['speaker']
+                and previous['parts'] == 1
+                and len(previous['text']) + len(text) <= target_chars):
+            # 同一说话人的相邻短句合并为一次合成
+            previous['text'] = _join(previous['text'], text)
+            previous['source_lines'].append(index)
+            continue
+
+        chunks = split_text(text, max_chars)
+        for part, chunk in enumerate(chunks):
+            segments.append({
+                'speaker': line['speaker'],
+                'text': chunk,
+                'source_lines': [index],
+                'part': part,
+                'parts': len(chunks),
+                'gap_before': split_gap if part > 0 else None
+            })
+
+    info(f"✂️ 对话分段: {len(dialogue)} 行 -> {len(segments)} 段"
+         f"（目标 {target_chars} 字，上限 {max_chars} 字）")
+    return segments
@@ -0,0 +1,476 @@
+# tts_backends.py - TTS 后端接口与注册表
+
+import math
+import time
+import wave
+import random
+import hashlib
+import threading
+from array import array
+from io import BytesIO
+from contextlib import contextmanager
+import config
+from utils.log_utils import info, error, warning
+from tts_edge import edge_tts_engine
+
+# Qwen3 TTS 输出参数（格式、采样率、音量、语速）
+QWEN3_TTS_CONFIG = getattr(config, 'QWEN3_TTS_CONFIG', {})
+
+# SpeechSynthesizer 会话池配置
+QWEN3_TTS_POOL = getattr(config, 'QWEN3_TTS_POOL', {})
+
+# 离线模拟后端配置
+SYNTHETIC_TTS_CONFIG = getattr(config, 'SYNTHETIC_TTS_CONFIG', {})
+
+# edge-tts 备选方案的声音
+FALLBACK_VOICES = {
+    "host": "zh-CN-XiaoxiaoNeural",
+    "guest": "zh-CN-YunxiNeural"
+}
+
+# 已注册的后端：名称 -> 后端类
+TTS_BACKENDS = {}
+
+
+def register_backend(name: str):
+    """
+    注册 TTS 后端的类装饰器
+
+    Args:
+        name: 后端名称（对应配置中的 TTS_BACKEND / TTS_FALLBACK_BACKEND）
+    """
+    def decorator(cls):
+        cls.name = name
+        TTS_BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def create_backend(name: str, **options):
+    """
+    按名称创建 TTS 后端
+
+    Args:
+        name: 后端名称
+        **options: 传给后端构造方法的参数
+
+    Returns:
+        TTSBackend: 后端实例，name 为空时返回 None
+
+    Raises:
+        ValueError: 后端未注册
+    """
+    if not name:
+        return None
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"未知的 TTS 后端: {name}（可用: {', '.join(sorted(TTS_BACKENDS))}）")
+    return TTS_BACKENDS[name](**options)
+
+
+def _pcm_to_wav(pcm_data: bytes, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """为原始 PCM 数据加上 WAV 文件头（不做任何转码）"""
+    output = BytesIO()
+    with wave.open(output, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm_data)
+    return output.getvalue()
+
+
+class TTSBackend:
+    """
+    TTS 后端基类
+
+    子类实现 synthesize()，返回 audio_format 格式的音频字节；
+    cache_identity() 返回参与缓存键计算的 (音色, 模型, 参数)。
+    """
+
+    name = None
+    audio_format = 'mp3'
+
+    def is_available(self) -> bool:
+        """后端是否可用（例如是否已配置密钥）"""
+        return True
+
+    def voice_for(self, speaker: str) -> str:
+        """返回说话人对应的音色"""
+        raise NotImplementedError
+
+    def cache_identity(self, speaker: str) -> tuple:
+        """
+        返回影响合成结果的标识
+
+        Args:
+            speaker: 说话人角色
+
+        Returns:
+            tuple: (音色, 模型, 参数字典)
+        """
+        return self.voice_for(speaker), self.name, {}
+
+    def synthesize(self, text: str, speaker: str) -> bytes:
+        """
+        合成一段语音
+
+        Args:
+            text: 要转换的文本
+            speaker: 说话人角色
+
+        Returns:
+            bytes: 音频数据，失败时返回 None
+        """
+        raise NotImplementedError
+
+
+class SynthesizerPool:
+    """
+    SpeechSynthesizer 会话池
+
+    按 (模型, 音色) 缓存已建立 WebSocket 连接的合成器，后续请求直接复用，
+    省去每段语音的连接与握手耗时。空闲超时、调用出错、未返回音频或无法确认连接状态的会话
+    会被关闭并丢弃，下一次请求新建合成器。
+    """
+
+    def __init__(self, max_idle_per_key: int = 4, idle_timeout: float = 60.0, max_uses: int = 200):
+        """
+        初始化会话池
+
+        Args:
+            max_idle_per_key: 每个 (模型, 音色) 最多保留的空闲会话数
+            idle_timeout: 空闲会话的最长保留时间（秒）
+            max_uses: 单个会话的最大复用次数，超过后重建
+        """
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self._idle = {}  # key -> [(synthesizer, 上次归还时间, 已使用次数)]
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _close(synthesizer):
+        """关闭会话（忽略关闭时的异常）"""
+        close = getattr(synthesizer, 'close', None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_healthy(synthesizer) -> bool:
+        """检查会话的 WebSocket 连接是否仍然可用（无法判断时视为不可用，由调用方丢弃后重建）"""
+        # SDK 自带的 SpeechSynthesizerObjectPool 同样用这个方法判断连接状态
+        is_connected = getattr(synthesizer, '_SpeechSynthesizer__is_connected', None)
+        if is_connected is not None:
+            try:
+                return bool(is_connected())
+            except Exception:
+                return False
+        ws = getattr(synthesizer, 'ws', None)
+        sock = getattr(ws, 'sock', None) if ws is not None else None
+        return sock is not None and bool(getattr(sock, 'connected', False))
+
+    def evict_idle(self):
+        """关闭并移除所有超过空闲时间的会话"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, entries in self._idle.items():
+                alive = []
+                for synthesizer, returned_at, uses in entries:
+                    if now - returned_at > self.idle_timeout:
+                        expired.append(synthesizer)
+                    else:
+                        alive.append((synthesizer, returned_at, uses))
+                self._idle[key] = alive
+        for synthesizer in expired:
+            self._close(synthesizer)
+
+    def _acquire(self, model: str, voice: str, params: dict):
+        key = (model, voice, tuple(sorted(params.items())))
+        self.evict_idle()
+        while True:
+            with self._lock:
+                entries = self._idle.get(key)
+                entry = entries.pop() if entries else None
+            if entry is None:
+                break
+            synthesizer, _, uses = entry
+            if self._is_healthy(synthesizer):
+                self.reused += 1
+                return key, synthesizer, uses
+            self._close(synthesizer)
+
+        from dashscope.audio.tts_v2 import SpeechSynthesizer
+
+        self.created += 1
+        return key, SpeechSynthesizer(model=model, voice=voice, **params), 0
+
+    def _release(self, key, synthesizer, uses: int):
+        if uses >= self.max_uses or not self._is_healthy(synthesizer):
+            self._close(synthesizer)
+            return
+        with self._lock:
+            entries = self._idle.setdefault(key, [])
+            if len(entries) < self.max_idle_per_key:
+                entries.append((synthesizer, time.monotonic(), uses))
+                return
+        self._close(synthesizer)
+
+    @contextmanager
+    def session(self, model: str, voice: str, **params):
+        """
+        借出一个合成器会话，使用完毕后自动归还
+
+        调用过程中抛出异常的会话不会归还到池中。
+
+        Args:
+            model: 模型名称
+            voice: 音色
+            **params: 其他 SpeechSynthesizer 构造参数
+
+        Yields:
+            SpeechSynthesizer: 可直接调用 call() 的合成器
+        """
+        key, synthesizer, uses = self._acquire(model, voice, params)
+        try:
+            yield synthesizer
+        except Exception:
+            self._close(synthesizer)
+            raise
+        else:
+            self._release(key, synthesizer, uses + 1)
+
+    def close_all(self):
+        """关闭池中所有空闲会话"""
+        with self._lock:
+            entries = [entry for items in self._idle.values() for entry in items]
+            self._idle.clear()
+        for synthesizer, _, _ in entries:
+            self._close(synthesizer)
+
+
+# 全局会话池（所有 Qwen3 后端实例共享）
+synthesizer_pool = SynthesizerPool(**QWEN3_TTS_POOL)
+
+
+def _resolve_audio_format(audio_format: str, sample_rate: int, bitrate: int = 128):
+    """
+    将配置中的格式和采样率映射为 SDK 的 AudioFormat
+
+    Args:
+        audio_format: 音频格式（wav, pcm, mp3）
+        sample_rate: 采样率
+        bitrate: MP3 码率（kbps），该采样率没有此码率时取最高码率
+
+    Returns:
+        AudioFormat: 对应的 SDK 枚举值，不支持时返回 None
+    """
+    from dashscope.audio.tts_v2 import AudioFormat
+
+    if audio_format in ('wav', 'pcm'):
+        name = f"{audio_format.upper()}_{sample_rate}HZ_MONO_16BIT"
+    elif audio_format == 'mp3':
+        # 各采样率提供的码率不同（8k/16k 只有 128kbps），优先使用与合并输出一致的码率（可直接拼接帧），
+        # 否则按前缀查找，有多个时取最高码率
+        prefix = f"MP3_{sample_rate}HZ_MONO_"
+        names = [name for name in AudioFormat.__members__ if name.startswith(prefix)]
+        if not names:
+            return None
+        preferred = f"{prefix}{bitrate}KBPS"
+        name = preferred if preferred in names else max(names, key=lambda n: int(''.join(c for c in n[len(prefix):] if c.isdigit()) or 0))
+    else:
+        return None
+    return getattr(AudioFormat, name, None)
+
+
+@register_backend("qwen3")
+class Qwen3Backend(TTSBackend):
+    """阿里云百炼 Qwen3 TTS 后端（qwen3-tts-instruct-flash-realtime）"""
+
+    def __init__(self, model: str = None, voice: str = "longanyang"):
+        """
+        初始化后端
+
+        Args:
+            model: 模型名称（默认使用 QWEN3_TTS_MODEL）
+            voice: 音色（longanyang 符合 cosyvoice-v3 系列模型的要求）
+        """
+        import dashscope
+
+        self.api_key = getattr(config, 'DASHSCOPE_API_KEY', None)
+        dashscope.api_key = self.api_key
+        # 设置 WebSocket API URL（北京地域）
+        dashscope.base_websocket_api_url = 'wss://dashscope.aliyuncs.com/api-ws/v1/inference'
+
+        self.model = model or getattr(config, 'QWEN3_TTS_MODEL', 'qwen3-tts-instruct-flash-realtime')
+        self.voice = voice
+
+        # 输出格式：默认请求无损的 WAV/PCM，避免逐段 MP3 解码和二次有损编码
+        self.request_format = QWEN3_TTS_CONFIG.get('format', 'wav')
+        self.sample_rate = QWEN3_TTS_CONFIG.get('sample_rate', 24000)
+        self.bitrate = QWEN3_TTS_CONFIG.get('bitrate', 128)
+        self.synthesizer_params = {
+            'volume': QWEN3_TTS_CONFIG.get('volume', 50),
+            'speech_rate': QWEN3_TTS_CONFIG.get('speed', 1.0)
+        }
+        sdk_format = _resolve_audio_format(self.request_format, self.sample_rate, self.bitrate)
+        if sdk_format is None:
+            warning(f"⚠️ 不支持的 TTS 输出格式: {self.request_format} {self.sample_rate}Hz，使用默认 MP3")
+            self.request_format = 'mp3'
+        else:
+            self.synthesizer_params['format'] = sdk_format
+        # 保存的音频格式（PCM 加上 WAV 文件头保存）
+        self.audio_format = 'wav' if self.request_format == 'pcm' else self.request_format
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    def voice_for(self, speaker: str) -> str:
+        return self.voice
+
+    def cache_identity(self, speaker: str) -> tuple:
+        return self.voice, self.model, {
+            'format': self.request_format,
+            'sample_rate': self.sample_rate,
+            'bitrate': self.bitrate,
+            'volume': self.synthesizer_params['volume'],
+            'speech_rate': self.synthesizer_params['speech_rate']
+        }
+
+    def synthesize(self, text: str, speaker: str) -> bytes:
+        try:
+            # 从会话池借出 SpeechSynthesizer（同一模型和音色复用已建立的 WebSocket 连接）
+            info(f"   📤 获取 SpeechSynthesizer 会话")
+            info(f"      模型: {self.model}")
+            info(f"      音色: {self.voice}")
+            info(f"      格式: {self.request_format} {self.sample_rate}Hz")
+
+            with synthesizer_pool.session(self.model, self.voice, **self.synthesizer_params) as synthesizer:
+                # 发送待合成文本，获取二进制音频
+                info(f"   📡 调用 synthesizer.call() 方法")
+                audio = synthesizer.call(text)
+
+                # 新建会话首次发送文本时需建立 WebSocket 连接，因此首包延迟会包含连接建立的耗时；
+                # 复用的会话则不再包含这部分耗时
+                info(f"   🆔 请求ID: {synthesizer.get_last_request_id()}")
+                info(f"   ⏱️ 首包延迟: {synthesizer.get_first_package_delay()} 毫秒")
+                if not audio:
+                    # 未返回音频的会话状态不确定，抛出异常使其不再归还到池中
+                    raise RuntimeError("Qwen3 模型未返回音频数据")
+
+            info(f"   ✅ 成功获取音频数据: {len(audio)} bytes")
+            if self.request_format == 'pcm':
+                audio = _pcm_to_wav(audio, self.sample_rate)
+            return audio
+
+        except Exception as e:
+            error(f"   ❌ Qwen3 模型调用失败: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+
+@register_backend("edge")
+class EdgeBackend(TTSBackend):
+    """edge-tts 后端（微软免费语音合成，协程运行在共享事件循环上）"""
+
+    audio_format = 'mp3'
+
+    def __init__(self, voices: dict = None):
+        """
+        初始化后端
+
+        Args:
+            voices: 说话人 -> edge-tts 声音名称
+        """
+        self.voices = voices or FALLBACK_VOICES
+
+    def voice_for(self, speaker: str) -> str:
+        return self.voices.get(speaker, self.voices.get("guest"))
+
+    def cache_identity(self, speaker: str) -> tuple:
+        return self.voice_for(speaker), "edge-tts", {}
+
+    def synthesize(self, text: str, speaker: str) -> bytes:
+        voice = self.voice_for(speaker)
+        info(f"   🗣️ 使用 edge-tts 声音: {voice}")
+        # 合成协程在共享的 edge-tts 事件循环上执行，当前线程只等待结果
+        return edge_tts_engine.synthesize_sync(text, voice)
+
+
+@register_backend("synthetic")
+class SyntheticBackend(TTSBackend):
+    """
+    离线模拟后端
+
+    不访问网络，按文本长度生成时长接近真实语音的 PCM（WAV），
+    并按配置模拟请求延迟和抖动。相同文本总是得到相同的音频和延迟，
+    用于在无网络环境下压测和基准测试流水线的其余部分。
+    """
+
+    audio_format = 'wav'
+
+    # 不同说话人使用不同音高，便于试听区分
+    PITCHES = {"host": 200, "guest": 300}
+
+    def __init__(
+        self,
+        chars_per_second: float = None,
+        sample_rate: int = None,
+        latency: float = None,
+        jitter: float = None,
+        seed: int = None
+    ):
+        """
+        初始化后端（未指定的参数读取 SYNTHETIC_TTS_CONFIG）
+
+        Args:
+            chars_per_second: 语速（每秒字数），决定生成音频的时长
+            sample_rate: 采样率
+            latency: 每次请求的模拟延迟（秒）
+            jitter: 延迟抖动幅度（秒），实际延迟在 latency ± jitter 之间
+            seed: 随机种子
+        """
+        cfg = SYNTHETIC_TTS_CONFIG
+        self.chars_per_second = chars_per_second or cfg.get('chars_per_second', 4.5)
+        self.sample_rate = sample_rate or cfg.get('sample_rate', 24000)
+        self.latency = latency if latency is not None else cfg.get('latency', 0.3)
+        self.jitter = jitter if jitter is not None else cfg.get('jitter', 0.1)
+        self.seed = seed if seed is not None else cfg.get('seed', 0)
+
+    def voice_for(self, speaker: str) -> str:
+        return f"tone-{self.PITCHES.get(speaker, 250)}hz"
+
+    def cache_identity(self, speaker: str) -> tuple:
+        return self.voice_for(speaker), "synthetic", {
+            'chars_per_second': self.chars_per_second,
+            'sample_rate': self.sample_rate
+        }
+
+    def _rng(self, text: str, speaker: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{speaker}:{text}".encode('utf-8')).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    def synthesize(self, text: str, speaker: str) -> bytes:
+        rng = self._rng(text, speaker)
+
+        # 模拟网络与推理延迟
+        delay = max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+        if delay:
+            time.sleep(delay)
+
+        # 生成一个整数周期的正弦波，再平铺到目标时长
+        duration = max(0.3, len(text.strip()) / self.chars_per_second)
+        total_samples = int(duration * self.sample_rate)
+        period = max(1, self.sample_rate // self.PITCHES.get(speaker, 250))
+        cycle = array('h', (
+            int(8000 * math.sin(2 * math.pi * i / period)) for i in range(period)
+        ))
+        samples = cycle * (total_samples // period + 1)
+        del samples[total_samples:]
+
+        return _pcm_to_wav(samples.tobytes(), self.sample_rate)
@@ -0,0 +1,131 @@
+# tts_edge.py - edge-tts 异步语音合成引擎（备选方案）
+
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import config
+from utils.log_utils import info
+
+# edge-tts 引擎配置
+EDGE_TTS_CONFIG = getattr(config, 'EDGE_TTS_CONFIG', {})
+
+
+class EdgeTTSEngine:
+    """
+    基于 asyncio 的 edge-tts 引擎
+
+    所有合成任务都在同一个事件循环上以协程方式运行，并通过信号量限制并发数。
+    服务器启动时可绑定服务器自身的事件循环；未绑定时引擎会启动一个常驻的
+    后台事件循环线程，而不是为每段语音新建线程和事件循环。
+    """
+
+    def __init__(self, concurrency: int = 8, timeout: float = 30.0):
+        """
+        初始化引擎
+
+        Args:
+            concurrency: 同时进行的合成数
+            timeout: 单段语音的超时时间（秒）
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._loop = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """
+        绑定到指定事件循环（例如 FastAPI 服务器的事件循环）
+
+        Args:
+            loop: 正在运行的事件循环
+        """
+        with self._lock:
+            self._loop = loop
+            self._semaphore = None
+        info(f"✅ edge-tts 引擎已绑定事件循环（并发数: {self.concurrency}）")
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """获取可用的事件循环，必要时启动后台事件循环线程"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="edge-tts-loop", daemon=True)
+                thread.start()
+                self._loop = loop
+                self._semaphore = None
+            return self._loop
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 信号量需在所属事件循环内创建
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def synthesize(self, text: str, voice: str, started: threading.Event = None) -> bytes:
+        """
+        合成语音（协程）
+
+        排队等待并发名额的时间不计入超时，取得名额后单段语音最多执行 timeout 秒。
+
+        Args:
+            text: 要转换的文本
+            voice: edge-tts 声音名称
+            started: 取得并发名额、开始合成时设置（供同步调用方计时）
+
+        Returns:
+            bytes: MP3 音频数据
+        """
+        import edge_tts
+
+        async def collect():
+            chunks = []
+            communicate = edge_tts.Communicate(text, voice)
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    chunks.append(chunk["data"])
+            return b"".join(chunks)
+
+        async with self._get_semaphore():
+            if started is not None:
+                started.set()
+            return await asyncio.wait_for(collect(), timeout=self.timeout)
+
+    def synthesize_sync(self, text: str, voice: str) -> bytes:
+        """
+        在工作线程中同步合成语音
+
+        协程被提交到引擎的事件循环上执行，当前线程只等待结果。
+        与协程的超时一致，排队等待并发名额的时间不计入超时；超时后取消协程，释放并发名额。
+        不能在事件循环所在线程中调用。
+
+        Args:
+            text: 要转换的文本
+            voice: edge-tts 声音名称
+
+        Returns:
+            bytes: MP3 音频数据
+        """
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("不能在 edge-tts 事件循环线程中同步等待合成结果，请使用 await synthesize()")
+
+        started = threading.Event()
+        future = asyncio.run_coroutine_threadsafe(self.synthesize(text, voice, started), loop)
+        try:
+            while not started.wait(0.5):
+                if future.done():
+                    break
+            return future.result(timeout=self.timeout + 5)
+        except FutureTimeoutError:
+            # 协程仍在事件循环上运行并占用并发名额，取消它
+            future.cancel()
+            raise
+
+
+# 全局实例（所有 TTS 引擎共享同一个事件循环和并发限制）
+edge_tts_engine = EdgeTTSEngine(**EDGE_TTS_CONFIG)
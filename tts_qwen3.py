@@ -1,37 +1,157 @@
-# tts_qwen3.py - Qwen3 TTS引擎
+# tts_qwen3.py - TTS引擎（默认使用 Qwen3 后端）
 
 import os
 import time
-import dashscope
-from dashscope.audio.tts_v2 import *
-from config import QWEN3_TTS_MODEL, DASHSCOPE_API_KEY
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+import config
 from utils.log_utils import info, error, warning
 from utils.file_utils import ensure_directory
+from utils.tts_cache import TTSCache
+from utils.audio_buffer import AudioBuffer
+from utils.circuit_breaker import CircuitBreaker, LatencyTracker
+from tts_backends import create_backend
+
+# 主 TTS 后端与备选后端（见 tts_backends.TTS_BACKENDS）
+TTS_BACKEND = getattr(config, 'TTS_BACKEND', 'qwen3')
+TTS_FALLBACK_BACKEND = getattr(config, 'TTS_FALLBACK_BACKEND', 'edge')
+
+# 对话合成的默认并发数（同时进行的 TTS 请求数）
+TTS_CONCURRENCY = getattr(config, 'TTS_CONCURRENCY', 4)
+
+# 是否以内存片段的形式把合成结果交给合并器
+TTS_IN_MEMORY = getattr(config, 'TTS_IN_MEMORY', True)
+
+# TTS 片段缓存配置
+TTS_CACHE = getattr(config, 'TTS_CACHE', {})
+
+# 每个后端的熔断器配置
+TTS_CIRCUIT_BREAKER = getattr(config, 'TTS_CIRCUIT_BREAKER', {})
+
+# 对冲请求配置（主后端迟迟未返回时同时请求备选后端）
+TTS_HEDGING = getattr(config, 'TTS_HEDGING', {})
+
+
+def _unique_name(speaker: str, suffix: str = "") -> str:
+    """生成不会在并发合成时冲突的音频文件名"""
+    timestamp = int(time.time() * 1000)
+    return f"{speaker}_{timestamp}_{uuid.uuid4().hex[:6]}{suffix}.mp3"
+
 
 class Qwen3TTSEngine:
-    """Qwen3 TTS引擎（使用qwen3-tts-instruct-flash-realtime模型）"""
+    """TTS引擎（主后端默认为 qwen3-tts-instruct-flash-realtime，失败时使用备选后端）"""
 
-    def __init__(self):
-        self.api_key = DASHSCOPE_API_KEY
-        dashscope.api_key = self.api_key
-        # 设置 WebSocket API URL（北京地域）
-        dashscope.base_websocket_api_url = 'wss://dashscope.aliyuncs.com/api-ws/v1/inference'
+    def __init__(self, backend: str = None, fallback_backend: str = None):
+        """
+        初始化引擎
+
+        Args:
+            backend: 主后端名称（默认使用 TTS_BACKEND）
+            fallback_backend: 备选后端名称（默认使用 TTS_FALLBACK_BACKEND，空字符串表示不使用）
+        """
         self.audio_dir = os.path.join(os.path.dirname(__file__), 'audio')
         ensure_directory(self.audio_dir)
 
+        self.backend = create_backend(backend or TTS_BACKEND)
+        self.fallback_backend = create_backend(
+            TTS_FALLBACK_BACKEND if fallback_backend is None else fallback_backend
+        )
         # 模型名称
-        self.model = QWEN3_TTS_MODEL
+        self.model = getattr(self.backend, 'model', self.backend.name)
+        info(f"✅ TTS 后端: {self.backend.name}"
+             f"（备选: {self.fallback_backend.name if self.fallback_backend else '无'}）")
+
+        # 每个后端一个熔断器：主后端不健康时直接走备选后端
+        self.breakers = {
+            b.name: CircuitBreaker(b.name, **TTS_CIRCUIT_BREAKER)
+            for b in (self.backend, self.fallback_backend) if b
+        }
+        # 主后端延迟统计（用于计算对冲等待时间）
+        self.latency = LatencyTracker()
+        self.hedging = bool(TTS_HEDGING.get('enabled', False)) and self.fallback_backend is not None
+        self._hedge_executor = None
+        if self.hedging:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=max(2, TTS_CONCURRENCY * 2),
+                thread_name_prefix="tts-hedge"
+            )
+
+        # 语音片段缓存（相同文本和说话人只合成一次）
+        self.cache = None
+        if TTS_CACHE.get('enabled', True):
+            self.cache = TTSCache(
+                os.path.join(self.audio_dir, 'cache'),
+                max_bytes=TTS_CACHE.get('max_bytes', 512 * 1024 * 1024),
+                sync_interval=TTS_CACHE.get('sync_interval', 60)
+            )
+
+    def _save_audio(self, audio_data: bytes, speaker: str, cache_key: str, suffix: str = "",
+                    audio_format: str = 'mp3') -> str:
+        """
+        保存音频数据（启用缓存时写入缓存目录）
+
+        Args:
+            audio_data: 音频数据
+            speaker: 说话人角色
+            cache_key: 缓存键
+            suffix: 未启用缓存时附加到文件名的后缀
+            audio_format: 音频格式（决定文件扩展名）
+
+        Returns:
+            str: 音频文件路径
+        """
+        if self.cache:
+            return self.cache.put(cache_key, audio_data, ext=f".{audio_format}")
 
-    def text_to_speech(self, text: str, speaker: str) -> str:
+        filename = _unique_name(speaker, suffix)
+        file_path = os.path.join(self.audio_dir, os.path.splitext(filename)[0] + f".{audio_format}")
+        with open(file_path, 'wb') as f:
+            f.write(audio_data)
+        return file_path
+
+    def _deliver(self, audio_data: bytes, speaker: str, cache_key: str, suffix: str = "",
+                 audio_format: str = 'mp3', in_memory: bool = False):
+        """
+        输出合成结果
+
+        in_memory 为 True 时直接返回内存片段，不再写入单独的片段文件
+        （启用缓存时仍会写入缓存，供后续请求复用）。
+
+        Returns:
+            str | AudioBuffer: 音频文件路径或内存片段
+        """
+        if not in_memory:
+            return self._save_audio(audio_data, speaker, cache_key, suffix, audio_format)
+
+        source = None
+        if self.cache:
+            source = self.cache.put(cache_key, audio_data, ext=f".{audio_format}")
+        return AudioBuffer(audio_data, format=audio_format, name=f"{speaker}_{cache_key[:12]}",
+                           source=source)
+
+    def _cache_lookup(self, cache_key: str, in_memory: bool = False):
+        """查找缓存片段，命中时返回文件路径（in_memory 时返回内存片段）"""
+        if not self.cache:
+            return None
+        cached_path = self.cache.get(cache_key)
+        if cached_path:
+            info(f"   ♻️ 命中 TTS 缓存: {os.path.basename(cached_path)}")
+            if in_memory:
+                return AudioBuffer.from_file(cached_path)
+        return cached_path
+
+    def text_to_speech(self, text: str, speaker: str, in_memory: bool = False):
         """
         将文本转换为语音
 
         Args:
             text: 要转换的文本
             speaker: 说话人角色 ('host' 或 'guest')
+            in_memory: 为 True 时返回内存片段（AudioBuffer），不写入片段文件
 
         Returns:
-            str: 音频文件路径
+            str | AudioBuffer: 音频文件路径或内存片段
         """
 
         # 参数验证
@@ -39,147 +159,262 @@ class Qwen3TTSEngine:
             warning(f"   ❌ 文本内容为空")
             return None
 
-        if not self.api_key:
-            error(f"   ❌ DASHSCOPE_API_KEY 未配置")
-            return None
-
         try:
-            # 生成唯一的文件名
-            timestamp = int(time.time() * 1000)
-            filename = f"{speaker}_{timestamp}.mp3"
-            file_path = os.path.join(self.audio_dir, filename)
-
             # 发送文本
             info(f"   🎤 正在生成 [{speaker}] 的语音...")
             info(f"      文本: {text[:50]}..." if len(text) > 50 else f"      文本: {text}")
-            info(f"      模型: {self.model}")
-
-            # 尝试使用 qwen3 模型
-            audio_data = self._try_qwen3_model(text, speaker)
-
-            if audio_data:
-                # 写入音频数据
-                with open(file_path, 'wb') as f:
-                    f.write(audio_data)
-
-                file_size = os.path.getsize(file_path)
-                info(f"   ✓ 语音生成成功: {filename} ({file_size} bytes)")
-                return file_path
+            info(f"      后端: {self.backend.name} ({self.model})")
+
+            if not self.backend.is_available():
+                error(f"   ❌ TTS 后端 {self.backend.name} 不可用（如 DASHSCOPE_API_KEY 未配置），使用备选方案...")
+            elif self.hedging:
+                result, fallback_tried = self._hedged_synthesize(text, speaker, in_memory)
+                if result or fallback_tried:
+                    return result
+                info(f"   ⚠️ TTS 后端 {self.backend.name} 失败，使用备选方案...")
             else:
-                # 如果 qwen3 模型失败，使用备选方案
-                info(f"   ⚠️ Qwen3 模型失败，使用备选方案...")
-                return self._fallback_tts(text, speaker)
+                result = self._synthesize_with(self.backend, text, speaker, in_memory=in_memory)
+                if result:
+                    return result
+                # 如果主后端失败，使用备选方案
+                info(f"   ⚠️ TTS 后端 {self.backend.name} 失败，使用备选方案...")
+
+            return self._fallback_tts(text, speaker, in_memory)
 
         except Exception as e:
             error(f"   ❌ TTS转换失败: {str(e)}")
             import traceback
             traceback.print_exc()
             # 发生异常时使用备选方案
-            return self._fallback_tts(text, speaker)
+            return self._fallback_tts(text, speaker, in_memory)
 
-    def _try_qwen3_model(self, text: str, speaker: str) -> bytes:
+    def _synthesize_with(self, backend, text: str, speaker: str, suffix: str = "", in_memory: bool = False,
+                         gate: bool = True):
         """
-        尝试使用 qwen3 模型进行语音合成
+        使用指定后端合成语音（先查缓存）
 
         Args:
+            backend: TTS 后端
             text: 要转换的文本
             speaker: 说话人角色
+            suffix: 未启用缓存时附加到文件名的后缀
+            in_memory: 为 True 时返回内存片段
+            gate: 为 True 时后端熔断期间直接返回 None（不等待它失败）
 
         Returns:
-            bytes: 音频数据
+            str | AudioBuffer: 音频文件路径或内存片段，失败时返回 None
         """
+        # 相同文本、说话人、音色和参数的语音直接复用缓存
+        voice, model, params = backend.cache_identity(speaker)
+        cache_key = TTSCache.make_key(text, speaker, voice, model, params)
+        cached = self._cache_lookup(cache_key, in_memory)
+        if cached:
+            return cached
+
+        breaker = self.breakers.get(backend.name)
+        if gate and breaker and not breaker.allow_request():
+            info(f"   ⚡ TTS 后端 {backend.name} 熔断中，跳过")
+            return None
+
+        started = time.monotonic()
         try:
-            # 根据模型选择正确的音色
-            # 对于 qwen3-tts-instruct-flash-realtime，使用 longanyang 等音色
-            voice = "longanyang"  # 使用 longanyang 音色，符合 cosyvoice-v3 系列模型的要求
+            audio_data = backend.synthesize(text, speaker)
+        except Exception:
+            if breaker:
+                breaker.record_failure()
+            raise
+        if not audio_data:
+            if breaker:
+                breaker.record_failure()
+            return None
+        if breaker:
+            breaker.record_success()
+        if backend is self.backend:
+            self.latency.record(time.monotonic() - started)
+
+        result = self._deliver(audio_data, speaker, cache_key, suffix,
+                               audio_format=backend.audio_format, in_memory=in_memory)
+        info(f"   ✓ 语音生成成功 [{backend.name}]: "
+             f"{result if in_memory else os.path.basename(result)} ({len(audio_data)} bytes)")
+        return result
+
+    def _hedge_delay(self) -> float:
+        """对冲等待时间：主后端延迟的分位数（样本不足时使用初始值）"""
+        min_delay = TTS_HEDGING.get('min_delay', 1.0)
+        if len(self.latency) < TTS_HEDGING.get('min_samples', 5):
+            return max(min_delay, TTS_HEDGING.get('initial_delay', 3.0))
+        return max(min_delay, self.latency.percentile(TTS_HEDGING.get('percentile', 95)))
+
+    def _hedged_synthesize(self, text: str, speaker: str, in_memory: bool = False) -> tuple:
+        """
+        对冲请求：主后端超过延迟分位数仍未返回时，同时请求备选后端，取先成功的结果
 
-            # 实例化 SpeechSynthesizer，并在构造方法中传入模型、音色等请求参数
-            info(f"   📤 实例化 SpeechSynthesizer")
-            info(f"      模型: {self.model}")
-            info(f"      音色: {voice}")
+        SDK 的同步调用拿不到首包时间，因此等待时间按整个请求（到完整音频返回）计算，
+        延迟样本同样是完整请求的耗时；计时从主请求在线程池中实际开始执行时算起。
 
-            synthesizer = SpeechSynthesizer(model=self.model, voice=voice)
+        Args:
+            text: 要转换的文本
+            speaker: 说话人角色
+            in_memory: 为 True 时返回内存片段
 
-            # 发送待合成文本，获取二进制音频
-            info(f"   � 调用 synthesizer.call() 方法")
-            audio = synthesizer.call(text)
+        Returns:
+            tuple: (合成结果, 是否已尝试备选后端)
+        """
+        started = threading.Event()
+
+        def run_primary():
+            started.set()
+            return self._synthesize_with(self.backend, text, speaker, "", in_memory)
+
+        primary = self._hedge_executor.submit(run_primary)
+        delay = self._hedge_delay()
+        # 多个对话共用对冲线程池，排队等待的时间不计入对冲延迟
+        started.wait()
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            try:
+                return primary.result(), False
+            except Exception as e:
+                error(f"   ❌ TTS 后端 {self.backend.name} 异常: {str(e)}")
+                return None, False
+
+        fallback_breaker = self.breakers[self.fallback_backend.name]
+        if not fallback_breaker.allow_request():
+            # 备选后端也不健康，只能继续等待主后端
+            try:
+                return primary.result(), False
+            except Exception as e:
+                error(f"   ❌ TTS 后端 {self.backend.name} 异常: {str(e)}")
+                return None, False
+
+        info(f"   🔀 {self.backend.name} 超过 {delay:.2f}s 未返回，对冲请求 {self.fallback_backend.name}")
+        # 上面的检查已经占用了半开状态下唯一的探测机会，这里不再经过熔断器
+        secondary = self._hedge_executor.submit(
+            self._synthesize_with, self.fallback_backend, text, speaker, "_fallback", in_memory, False
+        )
+        for future in as_completed([primary, secondary]):
+            try:
+                result = future.result()
+            except Exception as e:
+                error(f"   ❌ 对冲请求失败: {str(e)}")
+                continue
+            if result:
+                # 另一个请求会在后台完成，其结果写入缓存
+                return result, True
+        return None, True
+
+    def health(self) -> dict:
+        """
+        获取各后端的熔断器状态与主后端延迟
 
-            # 首次发送文本时需建立 WebSocket 连接，因此首包延迟会包含连接建立的耗时
-            info(f"   � 请求ID: {synthesizer.get_last_request_id()}")
-            info(f"   � 首包延迟: {synthesizer.get_first_package_delay()} 毫秒")
+        Returns:
+            dict: {backend, fallback_backend, breakers, latency_p95, hedging}
+        """
+        return {
+            'backend': self.backend.name,
+            'fallback_backend': self.fallback_backend.name if self.fallback_backend else None,
+            'breakers': {name: breaker.state for name, breaker in self.breakers.items()},
+            'latency_p95': self.latency.percentile(95),
+            'hedging': self.hedging
+        }
+
+    def synthesize_dialogue(self, dialogue: list, concurrency: int = None, in_memory: bool = False,
+                            progress=None) -> list:
+        """
+        并发合成整段对话，结果按对话顺序返回
 
-            if audio:
-                info(f"   ✅ 成功获取音频数据: {len(audio)} bytes")
-                return audio
-            else:
-                error(f"   ❌ Qwen3 模型未返回音频数据")
-                return None
+        Args:
+            dialogue: 对话列表，格式: [{'speaker': 'host', 'text': '...'}, ...]
+            concurrency: 同时进行的合成数（默认使用 TTS_CONCURRENCY）
+            in_memory: 为 True 时返回内存片段（AudioBuffer），不写入片段文件
+            progress: 进度回调 progress(已完成段数, 总段数)，每完成一段（无论成败）调用一次
 
-        except Exception as e:
-            error(f"   ❌ Qwen3 模型调用失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return None
+        Returns:
+            list: 与 dialogue 一一对应的音频文件路径或内存片段，失败的条目为 None
+        """
+        return list(self.iter_dialogue(dialogue, concurrency, in_memory, progress))
 
-    def _fallback_tts(self, text: str, speaker: str) -> str:
+    def iter_dialogue(self, dialogue: list, concurrency: int = None, in_memory: bool = False,
+                      progress=None):
         """
-        备选 TTS 方案（使用 edge-tts）
+        并发合成整段对话，按对话顺序逐段产出结果
+
+        某一段及其之前的所有段都合成完成后立即产出，调用方可以边合成边播放或编码。
+        提前关闭生成器时取消尚未开始的合成。
+
+        Args:
+            dialogue: 对话列表，格式: [{'speaker': 'host', 'text': '...'}, ...]
+            concurrency: 同时进行的合成数（默认使用 TTS_CONCURRENCY）
+            in_memory: 为 True 时产出内存片段（AudioBuffer），不写入片段文件
+            progress: 进度回调 progress(已完成段数, 总段数)，每完成一段（无论成败）调用一次
+
+        Yields:
+            str | AudioBuffer | None: 音频文件路径或内存片段，失败的条目为 None
+        """
+        if not dialogue:
+            return
+
+        concurrency = max(1, min(concurrency or TTS_CONCURRENCY, len(dialogue)))
+        total = len(dialogue)
+        info(f"🎙️ 并发合成 {total} 段语音（并发数: {concurrency}）")
+        completed = [0]
+        progress_lock = threading.Lock()
+
+        def synthesize(index: int, line: dict):
+            info(f"   [{index + 1}/{total}] 正在生成语音...")
+            try:
+                return self.text_to_speech(line['text'], line['speaker'], in_memory=in_memory)
+            except Exception as e:
+                error(f"   ❌ 第 {index + 1} 段语音生成异常: {str(e)}")
+                return None
+            finally:
+                if progress:
+                    with progress_lock:
+                        completed[0] += 1
+                        progress(completed[0], total)
+
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="tts")
+        finished = False
+        try:
+            futures = [executor.submit(synthesize, i, line) for i, line in enumerate(dialogue)]
+            # 按提交顺序产出结果，保证与对话顺序一致
+            for future in futures:
+                yield future.result()
+            finished = True
+        finally:
+            # 调用方提前停止时不再等待剩余的合成
+            executor.shutdown(wait=finished, cancel_futures=not finished)
+
+        if self.cache:
+            stats = self.cache.stats()
+            info(f"   📦 TTS 缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+                 f"占用 {stats['bytes']/1024/1024:.1f}/{stats['max_bytes']/1024/1024:.0f} MB")
+
+    def _fallback_tts(self, text: str, speaker: str, in_memory: bool = False):
+        """
+        备选 TTS 方案（默认使用 edge-tts）
 
         Args:
             text: 要转换的文本
             speaker: 说话人角色
+            in_memory: 为 True 时返回内存片段
 
         Returns:
-            str: 音频文件路径
+            str | AudioBuffer: 音频文件路径或内存片段
         """
+        if not self.fallback_backend:
+            error(f"   ❌ 未配置备选 TTS 后端")
+            return None
+
         try:
-            # 生成唯一的文件名
-            timestamp = int(time.time() * 1000)
-            filename = f"{speaker}_{timestamp}_fallback.mp3"
-            file_path = os.path.join(self.audio_dir, filename)
-
-            info(f"   🎤 使用备选 TTS 方案...")
-
-            # 使用 edge-tts（免费的 TTS 服务）
-            import edge_tts
-
-            # 选择声音
-            voice = "zh-CN-XiaoxiaoNeural" if speaker == "host" else "zh-CN-YunxiNeural"
-
-            info(f"   🗣️ 使用 edge-tts 声音: {voice}")
-
-            # 使用线程池来运行异步代码
-            import asyncio
-            import concurrent.futures
-
-            async def save_audio():
-                communicate = edge_tts.Communicate(text, voice)
-                with open(file_path, "wb") as f:
-                    async for chunk in communicate.stream():
-                        if chunk["type"] == "audio":
-                            f.write(chunk["data"])
-
-            # 在新线程中运行异步代码，避免事件循环冲突
-            def run_in_thread():
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(save_audio())
-                finally:
-                    loop.close()
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(run_in_thread)
-                future.result(timeout=30)  # 30秒超时
-
-            # 检查文件大小
-            file_size = os.path.getsize(file_path)
-            if file_size > 0:
-                info(f"   ✓ 备选方案语音生成成功: {filename} ({file_size} bytes)")
-                return file_path
-            else:
-                error(f"   ❌ 备选方案生成的音频文件为空")
-                return None
+            info(f"   🎤 使用备选 TTS 方案: {self.fallback_backend.name}")
+
+            # 备选后端是最后的手段，熔断时仍然尝试（结果仍计入熔断统计）
+            result = self._synthesize_with(self.fallback_backend, text, speaker, "_fallback",
+                                           in_memory=in_memory, gate=False)
+            if not result:
+                error(f"   ❌ 备选方案生成的音频为空")
+            return result
 
         except Exception as e:
             error(f"   ❌ 备选方案失败: {str(e)}")
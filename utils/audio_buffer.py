@@ -0,0 +1,87 @@
+# utils/audio_buffer.py - 内存音频片段
+
+import os
+from io import BytesIO
+from pydub import AudioSegment
+
+
+class AudioBuffer:
+    """
+    内存中的音频片段
+
+    保存 TTS 返回的原始字节及其格式，合并器可直接使用，无需先写入磁盘。
+    format 为 'pcm' 时 data 为原始 PCM 采样，需同时给出采样率、声道数和采样宽度。
+    """
+
+    def __init__(
+        self,
+        data: bytes,
+        format: str = 'mp3',
+        sample_rate: int = None,
+        channels: int = 1,
+        sample_width: int = 2,
+        name: str = None,
+        source: str = None
+    ):
+        """
+        初始化音频片段
+
+        Args:
+            data: 音频字节
+            format: 音频格式（mp3, wav, pcm 等）
+            sample_rate: 采样率（pcm 格式必填）
+            channels: 声道数（pcm 格式）
+            sample_width: 采样宽度，单位字节（pcm 格式）
+            name: 片段名称（用于日志）
+            source: 磁盘上相同内容的文件路径（如 TTS 缓存文件），供增量重渲染复用
+        """
+        self.data = data
+        self.format = format
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.name = name or f"<内存音频 {format}>"
+        self.source = source
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"AudioBuffer({self.name}, {self.format}, {len(self.data)} bytes)"
+
+    @classmethod
+    def from_file(cls, file_path: str, name: str = None) -> 'AudioBuffer':
+        """
+        从音频文件读取片段
+
+        Args:
+            file_path: 音频文件路径
+            name: 片段名称
+
+        Returns:
+            AudioBuffer: 音频片段
+        """
+        ext = os.path.splitext(file_path)[1].lower().lstrip('.') or 'mp3'
+        with open(file_path, 'rb') as f:
+            return cls(f.read(), format=ext, name=name or os.path.basename(file_path),
+                       source=file_path)
+
+    def to_segment(self) -> AudioSegment:
+        """
+        解码为 AudioSegment
+
+        pcm 格式直接构造，wav 格式由 pydub 在进程内解析，均不需要启动 ffmpeg。
+
+        Returns:
+            AudioSegment: 解码后的音频
+        """
+        if self.format == 'pcm':
+            if not self.sample_rate:
+                raise ValueError("PCM 音频缺少采样率")
+            return AudioSegment(
+                data=self.data,
+                sample_width=self.sample_width,
+                frame_rate=self.sample_rate,
+                channels=self.channels
+            )
+        return AudioSegment.from_file(BytesIO(self.data), format=self.format)
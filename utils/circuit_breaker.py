@@ -0,0 +1,124 @@
+# utils/circuit_breaker.py - 熔断器与延迟统计
+
+import time
+import threading
+from collections import deque
+from utils.log_utils import info, warning
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后进入打开状态，期间直接拒绝请求；
+    经过 reset_timeout 秒后进入半开状态，放行一个探测请求，
+    探测成功则关闭熔断器，失败则重新打开。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        初始化熔断器
+
+        Args:
+            name: 名称（用于日志）
+            failure_threshold: 连续失败多少次后打开
+            reset_timeout: 打开后多久允许探测（秒）
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        是否允许发起请求
+
+        Returns:
+            bool: 关闭状态或半开状态下的探测请求返回 True
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # 半开：同一时间只放行一个探测请求
+            if self._probe_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """记录一次成功请求"""
+        with self._lock:
+            if self._state != self.CLOSED:
+                info(f"✅ 熔断器 [{self.name}] 已恢复")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """记录一次失败请求"""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    warning(f"⚠️ 熔断器 [{self.name}] 打开（连续失败 {self._failures} 次），"
+                            f"{self.reset_timeout:.0f} 秒后重试")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """滑动窗口延迟统计（用于计算对冲请求的等待时间）"""
+
+    def __init__(self, window: int = 100):
+        """
+        初始化统计
+
+        Args:
+            window: 保留最近多少个样本
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        """记录一次请求耗时（秒）"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float:
+        """
+        计算延迟分位数
+
+        Args:
+            p: 分位（0-100）
+
+        Returns:
+            float: 分位延迟（秒），没有样本时返回 None
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
@@ -5,6 +5,7 @@ from bs4 import BeautifulSoup
 from docx import Document
 import PyPDF2
 from io import BytesIO
+from contextlib import nullcontext
 from typing import Optional
 from utils.log_utils import info, error
 
@@ -67,18 +68,20 @@ class DocumentAnalyzer:
             error(f"❌ 网页分析失败: {str(e)}")
             return None
 
-    def analyze_word(self, file_path: str) -> dict:
+    def analyze_word(self, file_path, name: str = None) -> dict:
         """
         分析 Word 文档
 
         Args:
-            file_path: Word 文档路径
+            file_path: Word 文档路径，或可 seek 的二进制文件对象（如上传文件，无需先写入磁盘）
+            name: 文档名称（用于日志和返回结果，默认使用 file_path）
 
         Returns:
             dict: {title, content, theme}
         """
+        name = name or str(file_path)
         try:
-            info(f"🔍 正在分析 Word 文档: {file_path}")
+            info(f"🔍 正在分析 Word 文档: {name}")
 
             doc = Document(file_path)
 
@@ -95,7 +98,7 @@ class DocumentAnalyzer:
             return {
                 'title': title or '未命名文档',
                 'content': content,
-                'file_path': file_path,
+                'file_path': name,
                 'type': 'word'
             }
 
@@ -103,23 +106,25 @@ class DocumentAnalyzer:
             error(f"❌ Word 文档分析失败: {str(e)}")
             return None
 
-    def analyze_pdf(self, file_path: str) -> dict:
+    def analyze_pdf(self, file_path, name: str = None) -> dict:
         """
         分析 PDF 文档
 
         Args:
-            file_path: PDF 文档路径
+            file_path: PDF 文档路径，或可 seek 的二进制文件对象（如上传文件，无需先写入磁盘）
+            name: 文档名称（用于日志和返回结果，默认使用 file_path）
 
         Returns:
             dict: {title, content, theme}
         """
+        name = name or str(file_path)
         try:
-            info(f"🔍 正在分析 PDF 文档: {file_path}")
+            info(f"🔍 正在分析 PDF 文档: {name}")
 
             content = ''
             title = ''
 
-            with open(file_path, 'rb') as file:
+            with (open(file_path, 'rb') if isinstance(file_path, str) else nullcontext(file_path)) as file:
                 pdf_reader = PyPDF2.PdfReader(file)
 
                 # 提取标题（第一页的第一段）
@@ -130,10 +135,12 @@ class DocumentAnalyzer:
                         lines = text.split('\n')
                         title = lines[0].strip()
 
-                # 提取所有页面内容
+                # 提取页面内容（超过长度上限后不再解析后面的页面）
                 for page in pdf_reader.pages:
                     text = page.extract_text()
                     content += text + '\n'
+                    if len(content) > 5000:
+                        break
 
                 # 限制长度
                 if len(content) > 5000:
@@ -144,7 +151,7 @@ class DocumentAnalyzer:
             return {
                 'title': title or '未命名文档',
                 'content': content,
-                'file_path': file_path,
+                'file_path': name,
                 'type': 'pdf'
             }
 
@@ -0,0 +1,72 @@
+# utils/file_lock.py - 跨进程文件锁
+
+import os
+import threading
+from utils.file_utils import ensure_directory
+
+try:
+    import fcntl
+except ImportError:  # Windows：只支持单进程部署，退化为进程内锁
+    fcntl = None
+
+
+class FileLock:
+    """
+    基于 flock 的跨进程互斥锁
+
+    多个 uvicorn 工作进程共享缓存目录、清理任务等状态时，用锁文件保证同一时刻只有一个进程执行。
+    同一进程内的线程之间也互斥。没有 fcntl 的平台上只在进程内互斥。
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 锁文件路径（不存在时自动创建）
+        """
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        ensure_directory(os.path.dirname(path))
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        获取锁
+
+        Args:
+            blocking: 为 False 时锁被占用立即返回 False
+
+        Returns:
+            bool: 是否获得锁
+        """
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if fcntl is None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            self._thread_lock.release()
+            return False
+        except BaseException:
+            os.close(fd)
+            self._thread_lock.release()
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        """释放锁"""
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -1,6 +1,7 @@
 # utils/file_utils.py - 文件操作工具
 
 import os
+import hashlib
 from docx import Document
 
 def read_file(file_path: str) -> str:
@@ -91,3 +92,21 @@ def get_file_size(file_path: str) -> int:
     if os.path.exists(file_path):
         return os.path.getsize(file_path)
     return 0
+
+
+def content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算文件内容的 sha256（分块读取，不一次性载入内存）
+
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
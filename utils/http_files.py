@@ -0,0 +1,136 @@
+# utils/http_files.py - 支持 ETag、条件请求和 Range 的文件响应
+
+import os
+from email.utils import formatdate
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+# 每次从磁盘读取并发送的字节数
+CHUNK_SIZE = 64 * 1024
+
+# 按内容命名的文件内容永不改变，可以长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _etag_matches(header: str, etag: str, weak: bool = True) -> bool:
+    """
+    比较 If-None-Match / If-Range 中的 ETag 列表
+
+    Args:
+        header: 请求头的值
+        etag: 当前 ETag
+        weak: 为 True 时使用弱比较（忽略 W/ 前缀），否则只接受完全相同的强 ETag
+    """
+    if header.strip() == '*':
+        return True
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if weak:
+            if candidate.removeprefix('W/') == etag.removeprefix('W/'):
+                return True
+        elif candidate == etag and not etag.startswith('W/'):
+            return True
+    return False
+
+
+def parse_range(header: str, size: int):
+    """
+    解析单个字节范围
+
+    Args:
+        header: Range 请求头（如 'bytes=0-1023'、'bytes=-500'、'bytes=1000-'）
+        size: 文件大小
+
+    Returns:
+        tuple | None | str: (起始, 结束) 闭区间；格式不支持（如多个范围）时返回 None，
+            按完整文件响应；范围无法满足时返回 'unsatisfiable'
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    start, _, end = spec.strip().partition('-')
+    try:
+        if not start:
+            # 后缀范围：最后 N 个字节
+            length = int(end)
+            if length <= 0:
+                return 'unsatisfiable'
+            return max(0, size - length), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, min(end, size - 1)
+
+
+def _iter_file(path: str, start: int, length: int):
+    """逐块读取文件的指定区间（同步生成器，由 Starlette 在线程池中迭代）"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(request: Request, path: str, media_type: str, etag: str,
+                  cache_control: str = "no-cache", filename: str = None) -> Response:
+    """
+    返回文件，处理 If-None-Match（304）、Range / If-Range（206 / 416）和 HEAD 请求
+
+    Args:
+        request: 当前请求
+        path: 文件路径
+        media_type: 媒体类型
+        etag: ETag（含引号，弱 ETag 带 W/ 前缀）
+        cache_control: Cache-Control 响应头
+        filename: 下载时的文件名（Content-Disposition）
+
+    Returns:
+        Response: 200、206、304 或 416 响应
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    start, end = 0, size - 1
+    status_code = 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range 不匹配（文件已变化）时忽略 Range，返回完整文件；Range 只接受强比较
+    if range_header and (not if_range or _etag_matches(if_range, etag, weak=False)):
+        byte_range = parse_range(range_header, size)
+        if byte_range == 'unsatisfiable':
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = max(0, end - start + 1)
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
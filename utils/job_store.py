@@ -0,0 +1,260 @@
+# utils/job_store.py - 任务状态持久化存储
+
+import os
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from utils.file_utils import ensure_directory
+
+
+class JobStore:
+    """
+    基于 SQLite 的任务状态存储
+
+    保存每个任务的请求参数、状态、进度和结果，服务器重启后仍可查询，
+    中断的任务可以重新排队（次数有限）。数据库使用 WAL 模式，多个工作进程可以同时读写：
+    任务由 claim 原子地领取，执行中的任务通过 heartbeat 续租，
+    所在进程退出（租约过期）后由其他进程通过 reclaim_stale 收回。
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    # 不会再变化的终止状态
+    FINISHED = (SUCCEEDED, FAILED)
+
+    def __init__(self, db_path: str):
+        """
+        初始化存储
+
+        Args:
+            db_path: SQLite 数据库文件路径
+        """
+        self.db_path = db_path
+        ensure_directory(os.path.dirname(db_path))
+        self._lock = threading.Lock()
+        # 自动提交模式，需要原子性的操作显式使用 BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        # 查询使用单独的连接：WAL 模式下读不会被写事务阻塞，也不必等待写连接的锁
+        self._read_lock = threading.Lock()
+        self._read_conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._read_conn.row_factory = sqlite3.Row
+        self._closed = False
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA busy_timeout=30000")
+        with self._transaction():
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    progress TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT,
+                    heartbeat REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            # 旧版数据库没有 owner / heartbeat / attempts 列
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in (('owner', 'TEXT'), ('heartbeat', 'REAL'), ('attempts', 'INTEGER NOT NULL DEFAULT 0')):
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    @contextmanager
+    def _transaction(self):
+        """写事务：BEGIN IMMEDIATE 立即取得写锁，多个进程的读-改-写不会交错"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        """将数据库行转换为任务字典"""
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'request': json.loads(row['request']),
+            'progress': json.loads(row['progress']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'owner': row['owner'],
+            'attempts': row['attempts']
+        }
+
+    def create(self, kind: str, request: dict) -> str:
+        """
+        创建排队中的任务
+
+        Args:
+            kind: 任务类型（如 'generate_audio'）
+            request: 请求参数（需可 JSON 序列化）
+
+        Returns:
+            str: 任务 ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, request, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, self.QUEUED, json.dumps(request, ensure_ascii=False),
+                 json.dumps({'stage': self.QUEUED}), now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> dict:
+        """
+        查询任务
+
+        Returns:
+            dict: 任务字典，不存在或存储已关闭（服务器正在停止）时返回 None
+        """
+        with self._read_lock:
+            if self._closed:
+                return None
+            row = self._read_conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def update(self, job_id: str, status: str = None, progress: dict = None,
+               result: dict = None, error: str = None, owner: str = None) -> bool:
+        """
+        更新任务状态、进度或结果（只更新给出的字段）
+
+        Args:
+            job_id: 任务 ID
+            status: 新状态
+            progress: 进度信息（整体替换）
+            result: 任务结果
+            error: 错误信息
+            owner: 给出时只更新该领取者仍在执行的任务（任务被收回后不再覆盖新的执行）
+
+        Returns:
+            bool: 是否有任务被更新
+        """
+        fields = {'updated_at': time.time()}
+        if status is not None:
+            fields['status'] = status
+        if progress is not None:
+            fields['progress'] = json.dumps(progress, ensure_ascii=False)
+        if result is not None:
+            fields['result'] = json.dumps(result, ensure_ascii=False)
+        if error is not None:
+            fields['error'] = error
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        condition, params = "id = ?", (job_id,)
+        if owner is not None:
+            condition += " AND owner = ? AND status = ?"
+            params += (owner, self.RUNNING)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE {condition}",
+                (*fields.values(), *params)
+            )
+        return cursor.rowcount > 0
+
+    def claim(self, owner: str) -> dict:
+        """
+        领取最早排队的任务并标记为运行中（多个进程同时领取时每个任务只会被领取一次）
+
+        Args:
+            owner: 领取者标识（进程）
+
+        Returns:
+            dict: 领取到的任务，没有排队中的任务时返回 None
+        """
+        now = time.time()
+        with self._transaction():
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (self.QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, heartbeat = ?, updated_at = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (self.RUNNING, owner, now, now, row['id'])
+            )
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+        return self._to_dict(row)
+
+    def heartbeat(self, owner: str):
+        """续租：刷新该领取者所有运行中任务的心跳时间"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = ?",
+                (time.time(), owner, self.RUNNING)
+            )
+
+    def reclaim_stale(self, lease_timeout: float, requeue: bool = True, max_attempts: int = 0) -> tuple:
+        """
+        收回心跳超时的运行中任务（所在进程已退出或卡死）
+
+        Args:
+            lease_timeout: 心跳超时时间（秒）
+            requeue: True 时重新排队，False 时标记为失败
+            max_attempts: 最多执行次数，已执行这么多次的任务不再排队而是标记为失败，
+                避免导致进程崩溃的任务反复拖垮每个领取它的进程（0 表示不限制）
+
+        Returns:
+            tuple: (重新排队的任务数, 标记为失败的任务数)
+        """
+        now = time.time()
+        stale = "status = ? AND COALESCE(heartbeat, updated_at) < ?"
+        stale_params = (self.RUNNING, now - lease_timeout)
+        with self._transaction():
+            requeued = 0
+            if requeue:
+                limit = " AND attempts < ?" if max_attempts else ""
+                requeued = self._conn.execute(
+                    f"UPDATE jobs SET status = ?, owner = NULL, progress = ?, updated_at = ? WHERE {stale}{limit}",
+                    (self.QUEUED, json.dumps({'stage': self.QUEUED}), now, *stale_params,
+                     *((max_attempts,) if max_attempts else ()))
+                ).rowcount
+                message = f"任务已中断 {max_attempts} 次（所在的进程退出），不再重试"
+            else:
+                message = "任务所在的进程已退出，任务已中断"
+            failed = self._conn.execute(
+                f"UPDATE jobs SET status = ?, owner = NULL, error = ?, updated_at = ? WHERE {stale}",
+                (self.FAILED, message, now, *stale_params)
+            ).rowcount
+        return requeued, failed
+
+    def count_unfinished(self) -> int:
+        """排队中和运行中的任务数（所有进程合计）"""
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (self.QUEUED, self.RUNNING)
+            ).fetchone()
+        return row[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+        with self._read_lock:
+            self._closed = True
+            self._read_conn.close()
@@ -0,0 +1,240 @@
+# utils/mp3_frames.py - MP3 帧解析（用于免解码直接拼接）
+
+import subprocess
+import threading
+from pydub.utils import get_encoder_name
+
+# Layer III 比特率表（kbps），按 MPEG 版本区分
+_BITRATES = {
+    'mpeg1': [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    'mpeg2': [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# 采样率表
+_SAMPLE_RATES = {
+    3: ('mpeg1', [44100, 48000, 32000]),
+    2: ('mpeg2', [22050, 24000, 16000]),
+    0: ('mpeg2.5', [11025, 12000, 8000]),
+}
+
+
+def parse_header(data: bytes, offset: int = 0) -> dict:
+    """
+    解析 MP3（MPEG Layer III）帧头
+
+    Args:
+        data: 音频数据
+        offset: 帧头位置
+
+    Returns:
+        dict: {version, bitrate, sample_rate, channels, frame_length, samples}，
+            不是有效的 Layer III 帧头时返回 None
+    """
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset:offset + 4]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_index = (b2 >> 4) & 0x0F
+    rate_index = (b2 >> 2) & 0x03
+    if version_bits not in _SAMPLE_RATES or layer_bits != 1:
+        return None
+    if bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    version, rates = _SAMPLE_RATES[version_bits]
+    bitrate = _BITRATES['mpeg1' if version == 'mpeg1' else 'mpeg2'][bitrate_index]
+    sample_rate = rates[rate_index]
+    padding = (b2 >> 1) & 0x01
+    channels = 1 if (b3 >> 6) & 0x03 == 3 else 2
+
+    if version == 'mpeg1':
+        samples = 1152
+        frame_length = 144 * bitrate * 1000 // sample_rate + padding
+    else:
+        samples = 576
+        frame_length = 72 * bitrate * 1000 // sample_rate + padding
+
+    return {
+        'version': version,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'frame_length': frame_length,
+        'samples': samples
+    }
+
+
+def _skip_id3v2(data: bytes) -> int:
+    """返回 ID3v2 标签之后的偏移量"""
+    if len(data) >= 10 and data[:3] == b'ID3':
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _is_info_frame(frame: bytes) -> bool:
+    """是否为 Xing/Info/VBRI 信息帧（不含音频，拼接时去掉）"""
+    head = frame[:64]
+    return b'Xing' in head or b'Info' in head or b'VBRI' in head
+
+
+# 解码器固有的延迟（采样数），LAME 标签中记录的编码器延迟不包含这部分
+DECODER_DELAY = 529
+
+
+def _parse_lame_tag(frame: bytes) -> tuple:
+    """
+    从 Xing/Info 信息帧的 LAME 标签中读取编码器延迟和末尾填充（LAME 与 ffmpeg 编码时都会写入）
+
+    Returns:
+        tuple: (编码器延迟, 末尾填充) 采样数，没有 LAME 标签时返回 None
+    """
+    head = frame[:64]
+    position = max(head.find(b'Xing'), head.find(b'Info'))
+    if position < 0:
+        return None
+    flags = int.from_bytes(frame[position + 4:position + 8], 'big')
+    offset = position + 8
+    offset += 4 if flags & 0x01 else 0    # 帧数
+    offset += 4 if flags & 0x02 else 0    # 字节数
+    offset += 100 if flags & 0x04 else 0  # TOC
+    offset += 4 if flags & 0x08 else 0    # 质量
+    tag = frame[offset:offset + 24]
+    if len(tag) < 24 or not tag[:4].isalpha():
+        return None
+    b0, b1, b2 = tag[21:24]
+    return (b0 << 4) | (b1 >> 4), ((b1 & 0x0F) << 8) | b2
+
+
+def gapless_trim(params: dict) -> tuple:
+    """
+    帧数据中实际语音前后的编码延迟与填充（解码合并时 ffmpeg 会按 LAME 标签去掉这些采样）
+
+    Args:
+        params: read_frames 返回的帧参数
+
+    Returns:
+        tuple: (开头的采样数, 末尾的采样数)，没有 LAME 标签时为 (0, 0)
+    """
+    if params.get('encoder_delay') is None:
+        return 0, 0
+    return (params['encoder_delay'] + DECODER_DELAY,
+            max(0, params['encoder_padding'] - DECODER_DELAY))
+
+
+def read_frames(data: bytes) -> tuple:
+    """
+    提取 MP3 数据中的音频帧
+
+    去掉 ID3 标签和 Xing/Info 信息帧，校验所有帧的版本、采样率、声道数和比特率一致。
+    信息帧中有 LAME 标签时，帧参数中的 encoder_delay / encoder_padding 为编码器延迟和末尾填充
+    （见 gapless_trim），否则为 None。
+
+    Args:
+        data: MP3 文件数据
+
+    Returns:
+        tuple: (帧参数 dict, 音频帧字节, 帧数)；不是恒定参数的 MP3 时返回 (None, None, 0)
+    """
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+
+    offset = _skip_id3v2(data)
+    # 跳过帧头之前的填充字节，找到第一个连续两帧都有效的位置
+    while offset < end:
+        header = parse_header(data, offset)
+        if header and parse_header(data, offset + header['frame_length']):
+            break
+        offset += 1
+    else:
+        return None, None, 0
+
+    params = None
+    frames = []
+    count = 0
+    gapless = None
+    while offset < end:
+        header = parse_header(data, offset)
+        if header is None or offset + header['frame_length'] > end:
+            # 文件末尾的不完整帧或垃圾数据
+            break
+        frame = data[offset:offset + header['frame_length']]
+        offset += header['frame_length']
+
+        if count == 0 and params is None and _is_info_frame(frame):
+            gapless = _parse_lame_tag(frame)
+            continue
+
+        key = (header['version'], header['sample_rate'], header['channels'], header['bitrate'])
+        if params is None:
+            params = header
+            params_key = key
+        elif key != params_key:
+            # 可变比特率或参数不一致
+            return None, None, 0
+
+        frames.append(frame)
+        count += 1
+
+    if not count:
+        return None, None, 0
+    params['encoder_delay'], params['encoder_padding'] = gapless or (None, None)
+    return params, b''.join(frames), count
+
+
+# 按 (采样率, 声道数, 比特率) 缓存预编码的静音帧
+_silence_frames = {}
+_silence_lock = threading.Lock()
+
+
+def silence_frame(sample_rate: int, channels: int, bitrate: int) -> bytes:
+    """
+    获取与给定参数一致的单个静音帧（首次调用时用 ffmpeg 编码并缓存）
+
+    编码时关闭比特池（bit reservoir），保证每帧独立，可以任意重复并插入到其他帧之间。
+
+    Args:
+        sample_rate: 采样率
+        channels: 声道数
+        bitrate: 比特率（kbps）
+
+    Returns:
+        bytes: 一个完整的 MP3 帧
+    """
+    key = (sample_rate, channels, bitrate)
+    with _silence_lock:
+        if key in _silence_frames:
+            return _silence_frames[key]
+
+    layout = 'mono' if channels == 1 else 'stereo'
+    command = [
+        get_encoder_name(), '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'anullsrc=r={sample_rate}:cl={layout}', '-t', '1',
+        '-c:a', 'libmp3lame', '-b:a', f'{bitrate}k', '-reservoir', '0',
+        '-write_xing', '0', '-id3v2_version', '0', '-f', 'mp3', 'pipe:1'
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf-8', errors='replace').strip())
+
+    params, data, count = read_frames(result.stdout)
+    if params is None or count < 3:
+        raise RuntimeError("无法生成静音帧")
+    if (params['sample_rate'], params['channels'], params['bitrate']) != key:
+        raise RuntimeError(f"静音帧参数不一致: {params}")
+
+    # 取中间的一帧，避开编码器起始延迟和末尾填充
+    offset = 0
+    for _ in range(count // 2):
+        offset += parse_header(data, offset)['frame_length']
+    frame = data[offset:offset + parse_header(data, offset)['frame_length']]
+
+    with _silence_lock:
+        _silence_frames[key] = frame
+    return frame
@@ -0,0 +1,267 @@
+# utils/pcm_mixer.py - 基于 NumPy 的 PCM 拼接与混音
+
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from pydub import AudioSegment
+
+
+def gain_to_factor(volume: float) -> float:
+    """
+    将音量系数换算为线性增益
+
+    与合并器原有的 apply_gain(20 * (volume - 1)) 保持一致：
+    volume 为 1.0 时不变，每增加 0.1 约提高 2dB。
+
+    Args:
+        volume: 音量系数
+
+    Returns:
+        float: 线性增益
+    """
+    return 10 ** (volume - 1)
+
+
+def common_format(segments: list) -> tuple:
+    """
+    计算多个片段拼接时使用的统一格式（取最高采样率和最多声道数）
+
+    Args:
+        segments: AudioSegment 列表
+
+    Returns:
+        tuple: (采样率, 声道数)
+    """
+    frame_rate = max(segment.frame_rate for segment in segments)
+    channels = max(segment.channels for segment in segments)
+    return frame_rate, channels
+
+
+def segment_to_array(segment: AudioSegment, frame_rate: int, channels: int) -> np.ndarray:
+    """
+    将 AudioSegment 转换为 16 位整型采样数组
+
+    Args:
+        segment: 音频片段
+        frame_rate: 目标采样率
+        channels: 目标声道数
+
+    Returns:
+        np.ndarray: 形状为 (帧数, 声道数) 的 int16 数组
+    """
+    if segment.frame_rate != frame_rate:
+        segment = segment.set_frame_rate(frame_rate)
+    if segment.channels != channels:
+        segment = segment.set_channels(channels)
+    if segment.sample_width != 2:
+        segment = segment.set_sample_width(2)
+    return np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, channels)
+
+
+def array_to_segment(samples: np.ndarray, frame_rate: int) -> AudioSegment:
+    """
+    将采样数组转换回 16 位 AudioSegment（超出范围的采样被削波）
+
+    Args:
+        samples: 形状为 (帧数, 声道数) 的数组
+        frame_rate: 采样率
+
+    Returns:
+        AudioSegment: 音频片段
+    """
+    pcm = np.clip(samples, -32768, 32767).astype(np.int16)
+    return AudioSegment(
+        data=pcm.tobytes(),
+        sample_width=2,
+        frame_rate=frame_rate,
+        channels=samples.shape[1]
+    )
+
+
+def ms_to_frames(ms: float, frame_rate: int) -> int:
+    """毫秒换算为帧数"""
+    return int(round(ms * frame_rate / 1000))
+
+
+def render_timeline(arrays: list, gaps: list, frame_rate: int, channels: int, gain: float = 1.0) -> tuple:
+    """
+    将多个片段按顺序写入一个预分配的缓冲区
+
+    先计算总长度，再把每个片段和静音间隔直接写到最终位置，
+    避免逐段拼接时反复复制已累积的数据。写入后会释放 arrays 中对应的引用。
+
+    Args:
+        arrays: 片段采样数组列表（形状为 (帧数, 声道数)）
+        gaps: 每个片段之前的静音（毫秒），第一个片段的间隔被忽略
+        frame_rate: 采样率
+        channels: 声道数
+        gain: 线性增益
+
+    Returns:
+        tuple: (float32 缓冲区, 每个片段的 (起始帧, 结束帧) 列表)
+    """
+    gap_frames = [0] + [ms_to_frames(gap, frame_rate) for gap in gaps[1:]]
+    total_frames = sum(len(array) for array in arrays) + sum(gap_frames)
+
+    output = np.zeros((total_frames, channels), dtype=np.float32)
+    offsets = []
+    position = 0
+    for i, array in enumerate(arrays):
+        position += gap_frames[i]
+        end = position + len(array)
+        if gain == 1.0:
+            output[position:end] = array
+        else:
+            np.multiply(array, gain, out=output[position:end], casting='unsafe')
+        offsets.append((position, end))
+        position = end
+        # 已写入缓冲区，尽早释放解码数据
+        arrays[i] = None
+
+    return output, offsets
+
+
+def mix_loop(output: np.ndarray, loop: np.ndarray, gain: float = 1.0, offset: int = 0,
+             envelope=None):
+    """
+    将循环素材（如背景音乐）叠加到缓冲区
+
+    按素材长度分块叠加，不会生成平铺后的完整副本。
+
+    Args:
+        output: 目标缓冲区（原地修改）
+        loop: 循环素材采样数组
+        gain: 素材的线性增益
+        offset: output 第一帧在整段音频中的位置（流式处理时按块调用）
+        envelope: 逐帧增益包络（长度与 output 相同的一维数组）或常数，用于闪避
+    """
+    if len(loop) == 0:
+        return
+    per_frame = isinstance(envelope, np.ndarray)
+    if envelope is not None and not per_frame:
+        gain *= envelope
+
+    total = len(output)
+    position = 0
+    while position < total:
+        loop_position = (offset + position) % len(loop)
+        count = min(total - position, len(loop) - loop_position)
+        chunk = np.multiply(loop[loop_position:loop_position + count], gain, dtype=np.float32)
+        if per_frame:
+            chunk *= envelope[position:position + count, None]
+        output[position:position + count] += chunk
+        position += count
+
+
+def gap_envelope(length: int, duck_gain: float, release_frames: int, attack_frames: int,
+                 speech_before: bool = True, speech_after: bool = True) -> np.ndarray:
+    """
+    计算两段人声之间（非人声区域）的背景音乐增益包络
+
+    人声结束后在 release_frames 内从 duck_gain 线性恢复到 1，
+    下一段人声开始前 attack_frames 内线性降回 duck_gain。
+
+    Args:
+        length: 区域帧数
+        duck_gain: 人声期间背景音乐的增益
+        release_frames: 恢复时长（帧）
+        attack_frames: 压低时长（帧）
+        speech_before: 区域之前是否有人声
+        speech_after: 区域之后是否有人声
+
+    Returns:
+        np.ndarray: 长度为 length 的 float32 包络
+    """
+    ramp = np.ones(length, dtype=np.float32)
+    if length == 0:
+        return ramp
+    t = np.arange(length, dtype=np.float32)
+    if speech_before and release_frames > 0:
+        np.minimum(ramp, (t + 1) / release_frames, out=ramp)
+    if speech_after and attack_frames > 0:
+        np.minimum(ramp, (length - t) / attack_frames, out=ramp)
+    return duck_gain + (1 - duck_gain) * ramp
+
+
+def ducking_envelope(total_frames: int, speech_ranges: list, duck_gain: float,
+                     release_frames: int, attack_frames: int) -> np.ndarray:
+    """
+    根据人声区间计算整段音频的背景音乐闪避包络
+
+    Args:
+        total_frames: 总帧数
+        speech_ranges: 人声区间 [(起始帧, 结束帧), ...]，按时间排序
+        duck_gain: 人声期间背景音乐的增益
+        release_frames: 人声结束后恢复的时长（帧）
+        attack_frames: 人声开始前压低的时长（帧）
+
+    Returns:
+        np.ndarray: 长度为 total_frames 的 float32 包络
+    """
+    envelope = np.empty(total_frames, dtype=np.float32)
+    previous_end = 0
+    for i, (start, end) in enumerate(speech_ranges):
+        envelope[previous_end:start] = gap_envelope(
+            start - previous_end, duck_gain, release_frames, attack_frames,
+            speech_before=i > 0, speech_after=True
+        )
+        envelope[start:end] = duck_gain
+        previous_end = end
+    envelope[previous_end:] = gap_envelope(
+        total_frames - previous_end, duck_gain, release_frames, attack_frames,
+        speech_before=bool(speech_ranges), speech_after=False
+    )
+    return envelope
+
+
+class LoopCache:
+    """
+    已解码背景音乐的进程内 LRU 缓存
+
+    以 (路径, 修改时间, 大小, 采样率, 声道数) 为键，文件被替换后自动失效。
+    缓存的数组为只读，多个合并任务可以安全共享。
+    """
+
+    def __init__(self, max_entries: int = 4):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最多缓存的音轨数
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, frame_rate: int, channels: int) -> np.ndarray:
+        """
+        获取解码后的音轨（未命中时解码并缓存）
+
+        Args:
+            path: 音频文件路径
+            frame_rate: 目标采样率
+            channels: 目标声道数
+
+        Returns:
+            np.ndarray: 形状为 (帧数, 声道数) 的只读 int16 数组
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, frame_rate, channels)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        samples = segment_to_array(AudioSegment.from_file(path), frame_rate, channels).copy()
+        samples.setflags(write=False)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = samples
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return samples
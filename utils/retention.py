@@ -0,0 +1,262 @@
+# utils/retention.py - 磁盘配额与过期文件清理
+
+import os
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from utils.log_utils import info, warning
+from utils.file_lock import FileLock
+
+
+class FilePins:
+    """
+    正在使用的文件登记表
+
+    生成流程在读取片段文件或写入输出期间登记这些路径，清理器跳过被登记的文件。
+    同一路径可被多次登记（引用计数）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    @contextmanager
+    def hold(self, paths):
+        """
+        在 with 块内保护给定的文件
+
+        Args:
+            paths: 文件路径列表（None 会被忽略）
+        """
+        held = [os.path.abspath(path) for path in paths if path]
+        with self._lock:
+            self._counts.update(held)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._counts.subtract(held)
+                for path in held:
+                    if self._counts[path] <= 0:
+                        del self._counts[path]
+
+    def snapshot(self) -> set:
+        """当前被登记的路径集合"""
+        with self._lock:
+            return set(self._counts)
+
+
+# 进程内的全局登记表
+pins = FilePins()
+
+
+class RetentionSweeper:
+    """
+    按目录配额清理文件
+
+    每个目录可以设置总大小上限（max_bytes）和最长保留时间（max_age_days）。
+    先删除超过保留时间的文件，再按最近访问时间从旧到新删除，直到总大小不超过上限。
+    同名不同扩展名的文件（如 podcast_x.mp3 与偏移表 podcast_x.json）作为一组同时保留或删除。
+    最近 min_age 秒内修改或访问过的文件、被登记（pins）或由 protected 回调返回的文件不会被删除。
+    登记表只在本进程内有效，多个工作进程共享目录时，其他进程正在使用的文件由 min_age 宽限期保护。
+    """
+
+    def __init__(self, directories: dict, min_age: float = 600, protected=None, lock_path: str = None):
+        """
+        初始化清理器
+
+        Args:
+            directories: {名称: {'path', 'max_bytes', 'max_age_days', 'exclude'}}，
+                exclude 为不参与清理的子目录名（如有自己配额的 TTS 缓存）
+            min_age: 宽限期（秒）
+            protected: 返回额外受保护路径集合的回调
+            lock_path: 锁文件路径，多个工作进程共享目录时用于协调清理（见 sweep_if_due）
+        """
+        self.directories = directories
+        self.min_age = min_age
+        self.protected = protected
+        self._file_lock = FileLock(lock_path) if lock_path else None
+        self.runs = 0
+        self.deleted = 0
+        self.freed_bytes = 0
+        self.last_report = {}
+
+    @staticmethod
+    def _scan(path: str, exclude: list) -> dict:
+        """
+        扫描目录，按去掉扩展名的路径分组
+
+        Returns:
+            dict: {组键: {'files': [(路径, 大小)], 'bytes', 'last_access'}}
+        """
+        groups = {}
+        for root, dirs, names in os.walk(path):
+            if root == path:
+                dirs[:] = [d for d in dirs if d not in exclude]
+            for name in names:
+                file_path = os.path.join(root, name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                group = groups.setdefault(os.path.splitext(file_path)[0],
+                                          {'files': [], 'bytes': 0, 'last_access': 0.0})
+                group['files'].append((file_path, stat.st_size))
+                group['bytes'] += stat.st_size
+                group['last_access'] = max(group['last_access'], stat.st_atime, stat.st_mtime)
+        return groups
+
+    def _delete(self, group: dict) -> int:
+        """删除一组文件，返回释放的字节数"""
+        freed = 0
+        for file_path, size in group['files']:
+            try:
+                os.remove(file_path)
+                freed += size
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                warning(f"   ⚠️ 删除文件失败: {file_path} - {str(e)}")
+        return freed
+
+    def _prune_empty_dirs(self, path: str, exclude: list, now: float) -> int:
+        """
+        删除清理后留下的空子目录（如按哈希分片的输出目录）
+
+        最近 min_age 秒内修改过的目录保留（刚被清空的目录在之后的清理中删除），
+        避免删除其他线程或进程刚创建、即将写入的目录。
+
+        Returns:
+            int: 删除的目录数
+        """
+        removed = 0
+        for root, dirs, names in os.walk(path, topdown=False):
+            if root == path or os.path.relpath(root, path).split(os.sep)[0] in exclude:
+                continue
+            try:
+                if os.listdir(root) or now - os.stat(root).st_mtime < self.min_age:
+                    continue
+                os.rmdir(root)
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def sweep_directory(self, name: str, options: dict, protected: set) -> dict:
+        """
+        清理单个目录
+
+        Returns:
+            dict: {files, bytes, deleted, freed_bytes}
+        """
+        path = options['path']
+        if not os.path.isdir(path):
+            return {'files': 0, 'bytes': 0, 'deleted': 0, 'freed_bytes': 0}
+
+        now = time.time()
+        groups = self._scan(path, options.get('exclude', []))
+        total = sum(group['bytes'] for group in groups.values())
+        max_bytes = options.get('max_bytes')
+        max_age = options.get('max_age_days')
+        max_age = max_age * 86400 if max_age else None
+
+        deleted = 0
+        freed = 0
+        # 最久未访问的在前
+        for group in sorted(groups.values(), key=lambda g: g['last_access']):
+            idle = now - group['last_access']
+            expired = max_age is not None and idle > max_age
+            over_quota = max_bytes is not None and total > max_bytes
+            if not expired and not over_quota:
+                break
+            if idle < self.min_age:
+                # 其余文件都更新，宽限期内不再删除
+                break
+            if any(os.path.abspath(file_path) in protected for file_path, _ in group['files']):
+                continue
+            released = self._delete(group)
+            total -= released
+            freed += released
+            deleted += len(group['files'])
+
+        if deleted:
+            info(f"🧹 {name}: 删除 {deleted} 个文件，释放 {freed/1024/1024:.1f} MB，"
+                 f"剩余 {total/1024/1024:.1f} MB")
+        pruned = self._prune_empty_dirs(path, options.get('exclude', []), now)
+        if pruned:
+            info(f"🧹 {name}: 删除 {pruned} 个空目录")
+        return {
+            'files': sum(len(group['files']) for group in groups.values()) - deleted,
+            'bytes': total,
+            'deleted': deleted,
+            'freed_bytes': freed
+        }
+
+    def sweep(self) -> dict:
+        """
+        按配额清理所有目录
+
+        Returns:
+            dict: {目录名称: {files, bytes, deleted, freed_bytes}}
+        """
+        protected = pins.snapshot()
+        if self.protected:
+            protected |= {os.path.abspath(path) for path in self.protected() if path}
+
+        report = {}
+        for name, options in self.directories.items():
+            try:
+                report[name] = self.sweep_directory(name, options, protected)
+            except Exception as e:
+                warning(f"   ⚠️ 清理目录失败: {name} - {str(e)}")
+                continue
+            self.deleted += report[name]['deleted']
+            self.freed_bytes += report[name]['freed_bytes']
+        self.runs += 1
+        self.last_report = report
+        return report
+
+    def sweep_if_due(self, interval: float) -> dict:
+        """
+        多个工作进程各自定期调用：同一时刻只有一个进程清理，
+        任一进程在 interval 秒内清理过时其他进程跳过（上次清理时间记录在锁文件中）
+
+        Returns:
+            dict: 清理报告（见 sweep），跳过时返回 None
+        """
+        if self._file_lock is None:
+            return self.sweep()
+        if not self._file_lock.acquire(blocking=False):
+            return None
+        try:
+            # 'a+' 在锁文件不存在时创建（没有 fcntl 的平台上 FileLock 不会创建文件）
+            with open(self._file_lock.path, 'a+') as f:
+                f.seek(0)
+                try:
+                    last_run = float(f.read().strip() or 0)
+                except ValueError:
+                    last_run = 0.0
+                if time.time() - last_run < interval * 0.9:
+                    return None
+                report = self.sweep()
+                f.seek(0)
+                f.truncate()
+                f.write(str(time.time()))
+            return report
+        finally:
+            self._file_lock.release()
+
+    def stats(self) -> dict:
+        """
+        获取清理统计
+
+        Returns:
+            dict: {runs, deleted, freed_bytes, directories}
+        """
+        return {
+            'runs': self.runs,
+            'deleted': self.deleted,
+            'freed_bytes': self.freed_bytes,
+            'directories': self.last_report
+        }
@@ -0,0 +1,188 @@
+# utils/stage_executor.py - 分阶段线程池与准入控制
+
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.log_utils import info, warning
+
+# 默认阶段配置：llm、tts 为网络请求（线程多、排队长），parse、merge 为 CPU 密集型
+DEFAULT_STAGE_CONFIG = {
+    "llm": {"workers": 8, "max_queue": 32, "retry_after": 10},
+    "tts": {"workers": 4, "max_queue": 8, "retry_after": 30},
+    "parse": {"workers": 2, "max_queue": 8, "retry_after": 5},
+    "merge": {"workers": 2, "max_queue": 8, "retry_after": 10}
+}
+
+
+class StageBusy(Exception):
+    """阶段的线程池和等待队列都已占满，请求被拒绝"""
+
+    def __init__(self, stage: str, retry_after: int):
+        super().__init__(f"{stage} 阶段繁忙，请 {retry_after} 秒后重试")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class StageExecutor:
+    """
+    单个处理阶段的线程池
+
+    阻塞调用（LLM/TTS 网络请求、文档解析、音频合并）在各自的线程池中执行，
+    某个阶段堆积时不会占用其他阶段的线程，也不会阻塞事件循环。
+    正在执行和等待的任务总数达到 workers + max_queue 时直接拒绝（StageBusy），
+    建议的重试时间按最近任务的平均耗时估算。
+    """
+
+    def __init__(self, name: str, workers: int = 4, max_queue: int = 16, retry_after: float = 5.0):
+        """
+        初始化线程池
+
+        Args:
+            name: 阶段名称
+            workers: 线程数
+            max_queue: 线程全部占用时最多等待的任务数
+            retry_after: 还没有耗时统计时建议的重试时间（秒）
+        """
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.default_retry_after = retry_after
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"stage-{name}")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._avg_duration = None  # 任务耗时的指数滑动平均（秒）
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def has_capacity(self) -> bool:
+        with self._lock:
+            return self._in_flight < self.capacity
+
+    def retry_after(self) -> int:
+        """估算多久之后会有空位（秒）"""
+        with self._lock:
+            if self._avg_duration is None:
+                return max(1, math.ceil(self.default_retry_after))
+            waiting = max(1, self._in_flight - self.workers + 1)
+            return max(1, math.ceil(self._avg_duration * waiting / self.workers))
+
+    def reject(self):
+        """拒绝请求并抛出 StageBusy"""
+        with self._lock:
+            self.rejected += 1
+        retry_after = self.retry_after()
+        warning(f"   🚦 {self.name} 阶段已满（{self.capacity}），拒绝请求，建议 {retry_after}s 后重试")
+        raise StageBusy(self.name, retry_after)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        在本阶段的线程池中执行阻塞函数
+
+        Args:
+            func: 阻塞函数
+            *args, **kwargs: 传给 func 的参数
+
+        Returns:
+            func 的返回值
+
+        Raises:
+            StageBusy: 线程池和等待队列都已占满
+        """
+        with self._lock:
+            admitted = self._in_flight < self.capacity
+            if admitted:
+                self._in_flight += 1
+        if not admitted:
+            self.reject()
+
+        def call():
+            started = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    if self._avg_duration is None:
+                        self._avg_duration = elapsed
+                    else:
+                        self._avg_duration = 0.8 * self._avg_duration + 0.2 * elapsed
+
+        future = self._executor.submit(call)
+        # 在线程实际结束（或排队中被取消）时释放名额：等待方被取消（客户端断开）时线程可能仍在运行
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self) -> dict:
+        """
+        获取线程池状态
+
+        Returns:
+            dict: {workers, max_queue, in_flight, rejected, avg_duration}
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'rejected': self.rejected,
+                'avg_duration': round(self._avg_duration, 3) if self._avg_duration is not None else None
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class StageExecutors:
+    """按阶段名称管理线程池"""
+
+    def __init__(self, config: dict):
+        """
+        初始化所有阶段
+
+        Args:
+            config: {阶段名称: {workers, max_queue, retry_after}, ...}
+        """
+        self._stages = {
+            name: StageExecutor(name, **options) for name, options in config.items()
+        }
+        info("✅ 阶段线程池: " + ", ".join(
+            f"{name}({stage.workers}+{stage.max_queue})" for name, stage in self._stages.items()
+        ))
+
+    def __getitem__(self, name: str) -> StageExecutor:
+        return self._stages[name]
+
+    async def run(self, stage: str, func, *args, **kwargs):
+        """在指定阶段的线程池中执行阻塞函数（见 StageExecutor.run）"""
+        return await self._stages[stage].run(func, *args, **kwargs)
+
+    def admit(self, *stages: str):
+        """
+        检查一个请求会经过的所有阶段是否都有空位，避免做到一半才被拒绝
+
+        只检查不预留：并发请求可能在检查之后占满后面的阶段，因此后续阶段的 run 仍可能抛出
+        StageBusy（尽力而为，只减少而不能杜绝做到一半被拒绝的情况）。
+
+        Raises:
+            StageBusy: 任一阶段已满
+        """
+        for name in stages:
+            stage = self._stages[name]
+            if not stage.has_capacity():
+                stage.reject()
+
+    def stats(self) -> dict:
+        return {name: stage.stats() for name, stage in self._stages.items()}
+
+    def shutdown(self):
+        for stage in self._stages.values():
+            stage.shutdown()
@@ -0,0 +1,161 @@
+# utils/stream_encoder.py - 流式音频编码器
+
+import subprocess
+import tempfile
+import threading
+import numpy as np
+from pydub.utils import get_encoder_name
+
+# 输出格式 -> (ffmpeg 编码器, ffmpeg 封装格式)；未列出的格式交给 ffmpeg 自动选择编码器
+FORMAT_CODECS = {
+    'mp3': ('libmp3lame', 'mp3'),
+    'wav': ('pcm_s16le', 'wav'),
+    'opus': ('libopus', 'ogg'),
+    'ogg': ('libvorbis', 'ogg'),
+    'flac': ('flac', 'flac'),
+}
+
+# 每次写入编码器的最大帧数（写静音时分块，避免一次性分配大块内存）
+WRITE_CHUNK_FRAMES = 64 * 1024
+
+# 输出到管道时每次读取的最大字节数
+READ_CHUNK_BYTES = 16 * 1024
+
+
+class StreamEncoder:
+    """
+    长期运行的 ffmpeg 编码进程
+
+    通过 stdin 持续接收 16 位 PCM，边接收边编码写入输出文件（或交给 sink 回调），
+    整个播客只启动一次编码器，内存占用与音频总时长无关。
+    """
+
+    def __init__(self, output_file: str, frame_rate: int, channels: int,
+                 output_format: str = 'mp3', bitrate: str = '128k', sink=None):
+        """
+        启动编码器
+
+        Args:
+            output_file: 输出文件路径（指定 sink 时忽略，可为 None）
+            frame_rate: 输入 PCM 采样率
+            channels: 输入 PCM 声道数
+            output_format: 输出格式（mp3, wav, opus 等）
+            bitrate: 输出比特率（无损格式忽略）
+            sink: 编码输出回调 sink(bytes)；指定后编码结果不写文件，
+                由后台线程从 ffmpeg 的 stdout 读取后依次交给 sink（用于边编码边发送）
+        """
+        self.output_file = output_file
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.frames_written = 0
+
+        codec, muxer = FORMAT_CODECS.get(output_format, (None, output_format))
+        command = [
+            get_encoder_name(), '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 's16le', '-ar', str(frame_rate), '-ac', str(channels), '-i', 'pipe:0',
+        ]
+        if codec:
+            command += ['-c:a', codec]
+        if bitrate and output_format not in ('wav', 'flac'):
+            command += ['-b:a', bitrate]
+        if sink is not None:
+            # 每个数据包立即写出，降低首个音频到达客户端的延迟
+            command += ['-flush_packets', '1', '-f', muxer, 'pipe:1']
+        else:
+            command += ['-f', muxer, output_file]
+
+        # stderr 写入临时文件，避免管道写满阻塞编码进程
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE if sink is not None else subprocess.DEVNULL,
+            stderr=self._stderr
+        )
+
+        # 管道输出：在线程中持续读取 stdout，避免输出管道写满后编码进程阻塞在写入上
+        self._pump = None
+        if sink is not None:
+            self._pump = threading.Thread(target=self._pump_output, args=(sink,),
+                                          name="encoder-output", daemon=True)
+            self._pump.start()
+
+    def _pump_output(self, sink):
+        """将编码进程的输出转交给 sink，直到进程关闭 stdout"""
+        stdout = self._process.stdout
+        while True:
+            chunk = stdout.read1(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            sink(chunk)
+
+    def write(self, samples: np.ndarray):
+        """
+        写入一段 PCM（较长的数组分块转换和写入，避免一次性复制整段数据）
+
+        Args:
+            samples: 形状为 (帧数, 声道数) 的采样数组（超出 16 位范围的采样被削波）
+        """
+        for start in range(0, len(samples), WRITE_CHUNK_FRAMES):
+            chunk = samples[start:start + WRITE_CHUNK_FRAMES]
+            if chunk.dtype != np.int16:
+                chunk = np.clip(chunk, -32768, 32767).astype(np.int16)
+            self._process.stdin.write(chunk.tobytes())
+            self.frames_written += len(chunk)
+
+    def write_silence(self, frames: int):
+        """
+        写入静音
+
+        Args:
+            frames: 静音帧数
+        """
+        while frames > 0:
+            count = min(frames, WRITE_CHUNK_FRAMES)
+            self.write(np.zeros((count, self.channels), dtype=np.int16))
+            frames -= count
+
+    @property
+    def duration_ms(self) -> float:
+        """已写入的音频时长（毫秒）"""
+        return self.frames_written * 1000 / self.frame_rate
+
+    def close(self):
+        """
+        结束输入并等待编码完成
+
+        Raises:
+            RuntimeError: 编码进程异常退出
+        """
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        if self._pump is not None:
+            self._pump.join()
+        self._stderr.seek(0)
+        message = self._stderr.read().decode('utf-8', errors='replace').strip()
+        self._stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"编码器退出码 {returncode}: {message}")
+
+    def abort(self):
+        """终止编码进程（出错时调用）"""
+        try:
+            self._process.kill()
+            self._process.wait()
+            if self._pump is not None:
+                self._pump.join()
+        finally:
+            self._stderr.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
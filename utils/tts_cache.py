@@ -0,0 +1,266 @@
+# utils/tts_cache.py - TTS 语音片段缓存
+
+import os
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from utils.log_utils import info, warning
+from utils.file_utils import ensure_directory
+from utils.file_lock import FileLock
+from utils.retention import pins
+
+
+class TTSCache:
+    """
+    内容寻址的 TTS 语音片段磁盘缓存
+
+    以 (文本, 说话人, 音色, 模型, TTS参数) 的哈希作为文件名保存音频，
+    总大小超过配额时按最近最少使用（LRU）顺序淘汰。
+    文件按哈希前两位分散到 256 个子目录，避免单个目录的条目过多。
+
+    多个工作进程可以共享同一个缓存目录：索引未命中时检查磁盘上是否已有其他进程写入的片段；
+    淘汰前重新扫描目录，按所有进程写入的总大小计算配额，并用锁文件保证同一时刻只有一个进程淘汰。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024, sync_interval: float = 60.0):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+            sync_interval: 重新扫描目录的最长间隔（秒），用于发现其他进程写入的片段
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.sync_interval = sync_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (相对路径, 大小)，越靠后越新
+        self._total_bytes = 0
+        self._synced_at = 0.0
+
+        ensure_directory(cache_dir)
+        self._file_lock = FileLock(os.path.join(cache_dir, '.lock'))
+        self._load()
+
+    def _scan(self) -> OrderedDict:
+        """
+        扫描缓存目录（含分片子目录和旧版平铺的文件），按访问时间排序
+
+        Returns:
+            OrderedDict: key -> (相对路径, 大小)，越靠后越新
+        """
+        files = []
+        for root, dirs, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # 扫描期间被其他进程淘汰
+                    continue
+                files.append((max(stat.st_atime, stat.st_mtime), os.path.relpath(path, self.cache_dir),
+                              stat.st_size))
+
+        entries = OrderedDict()
+        for _, name, size in sorted(files):
+            key = os.path.splitext(os.path.basename(name))[0]
+            entries[key] = (name, size)
+        return entries
+
+    def _load(self):
+        """从磁盘重建 LRU 索引"""
+        self._entries = self._scan()
+        self._total_bytes = sum(size for _, size in self._entries.values())
+        self._synced_at = time.monotonic()
+
+        if self._entries:
+            info(f"📦 TTS 缓存已加载: {len(self._entries)} 个片段, {self._total_bytes/1024/1024:.1f} MB")
+
+    def _find(self, key: str) -> str:
+        """在分片目录中查找其他进程写入的片段，返回相对路径（调用方需持有锁）"""
+        shard = os.path.join(self.cache_dir, key[:2])
+        try:
+            names = os.listdir(shard)
+        except OSError:
+            return None
+        for name in names:
+            if name.startswith(f"{key}."):
+                return os.path.join(key[:2], name)
+        return None
+
+    @staticmethod
+    def make_key(text: str, speaker: str, voice: str, model: str, params: dict = None) -> str:
+        """
+        计算缓存键
+
+        Args:
+            text: 合成文本
+            speaker: 说话人角色
+            voice: 音色
+            model: 模型名称
+            params: 其他影响输出的 TTS 参数
+
+        Returns:
+            str: 缓存键（sha256 十六进制）
+        """
+        payload = json.dumps(
+            [text, speaker, voice, model, params or {}],
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> str:
+        """
+        查找缓存片段
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            str: 命中时返回音频文件路径，否则返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                path = os.path.join(self.cache_dir, entry[0])
+                if os.path.exists(path):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    try:
+                        os.utime(path)
+                    except OSError:
+                        pass
+                    return path
+                # 文件已被外部删除
+                del self._entries[key]
+                self._total_bytes -= entry[1]
+
+            name = self._find(key)
+            if name is not None:
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    size = os.path.getsize(path)
+                    os.utime(path)
+                except OSError:
+                    size = None
+                if size is not None:
+                    self._entries[key] = (name, size)
+                    self._total_bytes += size
+                    self.hits += 1
+                    return path
+            self.misses += 1
+            return None
+
+    def put(self, key: str, data: bytes, ext: str = '.mp3') -> str:
+        """
+        写入缓存片段
+
+        Args:
+            key: 缓存键
+            data: 音频数据
+            ext: 文件扩展名
+
+        Returns:
+            str: 缓存文件路径
+        """
+        shard = os.path.join(self.cache_dir, key[:2])
+        ensure_directory(shard)
+        name = os.path.join(key[:2], f"{key}{ext}")
+        path = os.path.join(self.cache_dir, name)
+
+        # 先写临时文件再原子替换，避免并发读到半个文件
+        tmp_path = os.path.join(shard, f".{key}.{uuid.uuid4().hex[:6]}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+                if old[0] != name:
+                    # 旧版平铺的文件已被分片目录中的新文件取代
+                    try:
+                        os.remove(os.path.join(self.cache_dir, old[0]))
+                    except OSError:
+                        pass
+            self._entries[key] = (name, len(data))
+            self._total_bytes += len(data)
+            needs_sync = (self._total_bytes > self.max_bytes
+                          or time.monotonic() - self._synced_at > self.sync_interval)
+
+        if needs_sync:
+            self._sync(keep=key)
+        return path
+
+    def _sync(self, keep: str = None):
+        """
+        重新扫描目录后按配额淘汰
+
+        各进程的索引只包含自己写入或读到的片段，淘汰前需要从磁盘得到所有进程写入的总大小。
+        淘汰到配额的 90%，避免达到配额后每次写入都重新扫描。其他进程正在淘汰时跳过（下次写入时再检查）。
+        """
+        if not self._file_lock.acquire(blocking=False):
+            return
+        try:
+            entries = self._scan()
+            with self._lock:
+                self._entries = entries
+                self._total_bytes = sum(size for _, size in entries.values())
+                self._synced_at = time.monotonic()
+                self._evict(keep=keep, target=int(self.max_bytes * 0.9))
+        finally:
+            self._file_lock.release()
+
+    def _evict(self, keep: str = None, target: int = None):
+        """
+        淘汰最久未使用的片段直到总大小不超过 target（默认为配额，调用方需持有锁）
+
+        正在合并或重渲染中使用的片段（已登记到 pins）不会被淘汰。
+        """
+        target = self.max_bytes if target is None else target
+        if self._total_bytes <= target:
+            return
+        protected = pins.snapshot()
+        for key, (name, size) in list(self._entries.items()):
+            if self._total_bytes <= target:
+                break
+            path = os.path.join(self.cache_dir, name)
+            if key == keep or os.path.abspath(path) in protected:
+                continue
+            del self._entries[key]
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                warning(f"   ⚠️ 删除缓存片段失败: {name} - {str(e)}")
+
+    def stats(self) -> dict:
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: {hits, misses, evictions, entries, bytes, max_bytes}
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,71 @@
+# utils/upload_limit.py - 请求体大小限制
+
+import json
+from fastapi import HTTPException
+
+
+class BodySizeLimitMiddleware:
+    """
+    限制指定路径的请求体大小（ASGI 中间件）
+
+    Content-Length 超出上限时在读取请求体之前直接返回 413；
+    没有 Content-Length（分块传输）时边接收边计数，超出上限立即中止解析并返回 413，
+    不会把超大的请求体完整读入内存或写入临时文件。
+    """
+
+    def __init__(self, app, limits: dict):
+        """
+        Args:
+            app: 下游 ASGI 应用
+            limits: {路径: 最大字节数}
+        """
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope.get('path')) if scope['type'] == 'http' else None
+        if not max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        content_length = headers.get(b'content-length')
+        if content_length is not None:
+            try:
+                too_large = int(content_length) > max_bytes
+            except ValueError:
+                too_large = False
+            if too_large:
+                await self._reject(send, max_bytes)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > max_bytes:
+                    # 在请求解析过程中抛出，由 FastAPI 转换为 413 响应
+                    raise HTTPException(status_code=413, detail=self._detail(max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    def _detail(max_bytes: int) -> str:
+        return f"上传文件过大，最大允许 {max_bytes / 1024 / 1024:.1f} MB"
+
+    async def _reject(self, send, max_bytes: int):
+        body = json.dumps({"detail": self._detail(max_bytes)}, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'connection', b'close'),
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})